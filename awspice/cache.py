@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+from threading import Lock
+from time import time
+from os.path import expanduser, dirname, exists
+from os import makedirs
+import datetime
+import json
+import sqlite3
+from dateutil.parser import parse as parse_date
+
+
+class InventoryCache:
+    '''
+    Persistent cache of the results of AWS queries (describe_*, list_*) stored in a SQLite file
+
+    Results are saved for each account, region, operation and parameters (filters), so another query
+    with the same filters (even from another process) is answered without calling AWS until the
+    results expire. Each operation can have its own time to live and the oldest results are removed
+    when the file grows more than `max_size` bytes.
+
+    Examples:
+        aws = awspice.connect(profile='default', cache=True)
+        aws.service.cache.invalidate(operation='describe_instances')
+
+    Attributes:
+        path: Path of the SQLite file
+        ttls: Seconds to live of the results of each operation (i.e.: {'describe_images': 86400})
+        default_ttl: Seconds to live of the results of operations without their own ttl
+        max_size: Maximum size (bytes) of the stored results
+    '''
+
+    ttls = {
+        'describe_instances': 300,
+        'describe_instance_status': 60,
+        'describe_volumes': 600,
+        'describe_snapshots': 3600,
+        'describe_security_groups': 900,
+        'describe_addresses': 900,
+        'describe_vpcs': 3600,
+        'describe_images': 86400,
+        'describe_load_balancers': 900,
+        'describe_db_instances': 900,
+        'describe_db_snapshots': 3600,
+        'list_certificates': 3600,
+        'list_users': 3600,
+        'list_buckets': 3600,
+    }
+
+    def __init__(self, path='~/.awspice/cache.sqlite', ttls=None, default_ttl=300, max_size=256 * 1024 * 1024):
+        self.path = expanduser(path)
+        self.ttls = dict(self.ttls, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.lock = Lock()
+
+        if dirname(self.path) and not exists(dirname(self.path)):
+            makedirs(dirname(self.path))
+
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS results ('
+                            'account TEXT, region TEXT, operation TEXT, params TEXT, '
+                            'pages BLOB, size INTEGER, expires REAL, accessed REAL, '
+                            'PRIMARY KEY (account, region, operation, params))')
+
+    @classmethod
+    def _normalize(cls, params):
+        '''
+        Serialize the parameters of a query, so equivalent filters (in different order) get the same key
+        '''
+        params = dict(params)
+        if params.get('Filters'):
+            filters = [{'Name': f['Name'], 'Values': sorted(f['Values'])} for f in params['Filters']]
+            params['Filters'] = sorted(filters, key=lambda f: (f['Name'], f['Values']))
+        return json.dumps(params, sort_keys=True)
+
+    @classmethod
+    def _encode(cls, obj):
+        if isinstance(obj, datetime.datetime):
+            return {'__datetime__': obj.isoformat()}
+        raise TypeError('%r is not JSON serializable' % obj)
+
+    @classmethod
+    def _decode(cls, obj):
+        if '__datetime__' in obj:
+            return parse_date(obj['__datetime__'])
+        return obj
+
+    def serialize(self, page):
+        '''Serialize a page of results (dict) to be stored. Datetimes are kept as datetimes'''
+        return json.dumps(page, default=self._encode)
+
+    def get(self, account, region, operation, params):
+        '''
+        Get the pages of results stored for a query
+
+        Args:
+            account (str): Profile or access key used in the query
+            region (str): Region of the query
+            operation (str): Operation of the client with its service (i.e.: ec2.describe_instances)
+            params (dict): Parameters of the operation (i.e.: Filters)
+
+        Returns:
+            list: Pages of results, or None if they aren't stored or they have expired
+        '''
+        key = (account, region, operation, self._normalize(params))
+        with self.lock, self.db:
+            row = self.db.execute('SELECT pages FROM results WHERE account=? AND region=? AND operation=? '
+                                  'AND params=? AND expires>?', key + (time(),)).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE results SET accessed=? WHERE account=? AND region=? AND operation=? '
+                            'AND params=?', (time(),) + key)
+
+        return [json.loads(page, object_hook=self._decode) for page in json.loads(row[0])]
+
+    def set(self, account, region, operation, params, pages):
+        '''
+        Store the pages of results of a query
+
+        Args:
+            account (str): Profile or access key used in the query
+            region (str): Region of the query
+            operation (str): Operation of the client with its service (i.e.: ec2.describe_instances)
+            params (dict): Parameters of the operation (i.e.: Filters)
+            pages (list): Pages of results already serialized (see `serialize`)
+        '''
+        ttl = self.ttls.get(operation.split('.')[-1], self.default_ttl)
+        blob = json.dumps(pages)
+        key = (account, region, operation, self._normalize(params))
+        now = time()
+
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            key + (blob, len(blob), now + ttl, now))
+            self._evict()
+
+    def _evict(self):
+        # Remove expired results, then the least recently used ones until the size is under the limit
+        self.db.execute('DELETE FROM results WHERE expires<=?', (time(),))
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        rows = self.db.execute('SELECT rowid, size FROM results ORDER BY accessed').fetchall()
+        for rowid, size in rows:
+            if total <= self.max_size:
+                break
+            self.db.execute('DELETE FROM results WHERE rowid=?', (rowid,))
+            total -= size
+
+    def invalidate(self, account=None, region=None, operation=None):
+        '''
+        Remove the stored results which match with all the arguments (or all results without arguments)
+
+        Args:
+            account (str): Profile or access key
+            region (str): Region name
+            operation (str): Operation with or without service (i.e.: describe_instances, ec2.describe_instances)
+        '''
+        conditions, values = [], []
+        if account:
+            conditions.append('account=?')
+            values.append(account)
+        if region:
+            conditions.append('region=?')
+            values.append(region)
+        if operation:
+            conditions.append('(operation=? OR operation LIKE ?)')
+            values.extend([operation, '%.' + operation])
+
+        query = 'DELETE FROM results' + (' WHERE ' + ' AND '.join(conditions) if conditions else '')
+        with self.lock, self.db:
+            self.db.execute(query, values)
+
+    def clear(self):
+        '''Remove all the stored results'''
+        self.invalidate()
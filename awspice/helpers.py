@@ -1,45 +1,292 @@
 # -*- coding: utf-8 -*-
-from threading import Thread
-from Queue import Queue
-from time import mktime
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from Queue import Empty
+from time import mktime, time, sleep
+from array import array
+import os
 import json
+import struct
+import binascii
 import datetime
 import socket
 
-class Worker(Thread):
-    """
-    Thread executing tasks from a given tasks queue
-    http://code.activestate.com/recipes/577187-python-thread-pool/
-    """
-    def __init__(self, tasks):
-        Thread.__init__(self)
-        self.tasks = tasks
-        self.daemon = True
-        self.start()
-
-    def run(self):
-        while True:
-            func, args, kargs = self.tasks.get()
-            try: func(*args, **kargs)
-            except Exception, e: print e
-            self.tasks.task_done()
-
-class ThreadPool:
-    """
-    Pool of threads consuming tasks from a queue
-    http://code.activestate.com/recipes/577187-python-thread-pool/
-    """
-    def __init__(self, num_threads):
-        self.tasks = Queue(num_threads)
-        for _ in range(num_threads): Worker(self.tasks)
-
-    def add_task(self, func, *args, **kargs):
-        """Add a task to the queue"""
-        self.tasks.put((func, args, kargs))
-
-    def wait_completion(self):
-        """Wait for completion of all the tasks in the queue"""
-        self.tasks.join()
+class Executor(ThreadPoolExecutor):
+    '''
+    Pool of threads which runs tasks and returns a Future for each of them
+
+    Exceptions raised by a task are not lost: They are raised again by ``future.result()``.
+    Each future also has a ``timing`` dict with the time when its task started to run and the
+    seconds it took (``started`` and ``elapsed`` keys, missing until the task starts/finishes).
+
+    Tasks can submit tasks to the same pool and wait for them (nested fan-outs). A thread which waits
+    for results using ``map``, ``as_completed`` or ``wait_for`` doesn't stay idle: it runs the queued
+    tasks itself (``run_pending``), so the pool never hangs even if all its workers are waiting.
+
+    Examples:
+        pool = Executor(30)
+        futures = [pool.submit(client.describe_instances) for client in clients]
+        for future in pool.as_completed(futures):
+            print future.timing['elapsed'], future.result()
+    '''
+    def __init__(self, max_workers):
+        ThreadPoolExecutor.__init__(self, max_workers)
+        self.size = max_workers
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule a task and return its Future"""
+        timing = dict()
+
+        def task():
+            timing['started'] = time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timing['elapsed'] = time() - timing['started']
+
+        future = ThreadPoolExecutor.submit(self, task)
+        future.timing = timing
+        return future
+
+    def run_pending(self):
+        """Run one of the queued tasks in the current thread. Returns False if there weren't tasks"""
+        try:
+            item = self._work_queue.get_nowait()
+        except Empty:
+            return False
+
+        # None is the signal used to stop the workers on shutdown: Keep it for them
+        if item is None:
+            self._work_queue.put(None)
+            return False
+
+        item.run()
+        return True
+
+    def wait_for(self, future):
+        """Wait until a future has finished, running queued tasks meanwhile"""
+        while not future.done():
+            if not self.run_pending():
+                wait([future], timeout=0.05)
+
+    def map(self, fn, *iterables):
+        """Run fn for each item of the iterables and return an iterator with the results (in order)"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+
+        def results():
+            for future in futures:
+                self.wait_for(future)
+                yield future.result()
+        return results()
+
+    def as_completed(self, futures):
+        """Iterate over futures as they finish, running queued tasks meanwhile"""
+        pending = set(futures)
+        while pending:
+            finished = [future for future in pending if future.done()]
+            if not finished and not self.run_pending():
+                wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                pending.discard(future)
+                yield future
+
+
+class LRUCache:
+    '''
+    Thread-safe dictionary with a bounded size which discards the least recently used items
+
+    The values are built on demand by a factory function. The factory is called without holding
+    the lock, so building an expensive value (i.e. a Boto3 client) doesn't block other threads.
+
+    Examples:
+        cache = LRUCache(128)
+        client = cache.get(('ec2', 'eu-west-1'), lambda: boto3.client('ec2', region_name='eu-west-1'))
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, factory):
+        """Get the value of a key, building it with factory() if it is not cached"""
+        with self.lock:
+            if key in self.items:
+                value = self.items.pop(key)
+                self.items[key] = value
+                return value
+
+        value = factory()
+
+        with self.lock:
+            # Another thread could have built the same value meanwhile
+            value = self.items.pop(key, value)
+            self.items[key] = value
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Remove all the cached items"""
+        with self.lock:
+            self.items.clear()
+
+
+class RateLimiter:
+    '''
+    Adaptive rate limiter with a token bucket for each key (i.e. account, region and API)
+
+    Each bucket starts allowing `rate` calls per second (20 by default, the refill rate of the EC2 API for
+    describe calls). The rate of a bucket is reduced by half when the API throttles a call (down to `min_rate`)
+    and it grows by `increase` (a fraction of the rate) for each second of successful calls (up to `max_rate`),
+    so the callers stay close to the limit of the API without exceeding it.
+
+    Examples:
+        AwsBase.limiter = RateLimiter(rate=20)
+        limiter.acquire(('default', 'eu-west-1', 'DescribeInstances'))  # Blocks until a call is allowed
+        limiter.throttled(('default', 'eu-west-1', 'DescribeInstances'))  # API returned "Throttling"
+    '''
+    def __init__(self, rate=20.0, min_rate=0.5, max_rate=100.0, increase=0.5, decrease=0.5):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.buckets = dict()
+        self.lock = Lock()
+
+    def _bucket(self, key):
+        # Bucket: [calls per second, available tokens, time of last update]
+        if key not in self.buckets:
+            self.buckets[key] = [self.rate, self.rate, time()]
+        return self.buckets[key]
+
+    def acquire(self, key):
+        """Wait until the bucket of the key allows a new call"""
+        with self.lock:
+            bucket = self._bucket(key)
+            now = time()
+            # Refill tokens (up to 1 second of calls) and take one. If there weren't tokens left,
+            # the token is reserved and the caller waits until it would have been refilled.
+            bucket[1] = min(bucket[0], bucket[1] + (now - bucket[2]) * bucket[0]) - 1
+            bucket[2] = now
+            delay = -bucket[1] / bucket[0] if bucket[1] < 0 else 0
+        if delay:
+            sleep(delay)
+
+    def throttled(self, key):
+        """Reduce the rate of the key after the API has throttled a call"""
+        with self.lock:
+            bucket = self._bucket(key)
+            bucket[0] = max(self.min_rate, bucket[0] * self.decrease)
+            bucket[1] = min(bucket[1], bucket[0])
+
+    def succeeded(self, key):
+        """Increase the rate of the key after a successful call"""
+        with self.lock:
+            bucket = self._bucket(key)
+            # A bucket receives ~rate calls per second, so the rate grows `increase` times per second
+            bucket[0] = min(self.max_rate, bucket[0] * (1 + self.increase) ** (1 / bucket[0]))
+
+    def get_rate(self, key):
+        """Current calls per second allowed for the key"""
+        with self.lock:
+            return self._bucket(key)[0]
+
+
+class DnsCache:
+    '''
+    Cache of DNS answers which honours the TTL of the records
+
+    Answers are kept until their TTL expires. Negative answers (NXDOMAIN, NoAnswer) are kept for
+    `negative_ttl` seconds and raised again while they don't expire. Several domains can be resolved
+    at the same time with `resolve_all`.
+
+    Examples:
+        cache = DnsCache()
+        cname = cache.resolve('www.example.com', 'CNAME')[0]
+        cnames = cache.resolve_all(['www.example.com', 'api.example.com'], 'CNAME', pool=Executor(20))
+    '''
+    def __init__(self, negative_ttl=60, maxsize=10000):
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.items = dict()
+        self.lock = Lock()
+
+    def resolve(self, domain, rdtype='A'):
+        """
+        Get the records of a domain (from the cache if they haven't expired)
+
+        Raises:
+            dns.resolver.NXDOMAIN: DNS Name not registered.
+            dns.resolver.NoAnswer: DNS Name hasn't records of this type.
+
+        Returns:
+            list: Values of the records (i.e.: CNAMEs without the final dot)
+        """
+        import dns.resolver
+        key = (domain.lower().rstrip('.'), rdtype)
+        with self.lock:
+            item = self.items.get(key)
+        if item is None or item[0] <= time():
+            try:
+                answer = dns.resolver.query(domain, rdtype)
+                item = (answer.expiration, [str(record).rstrip('.') for record in answer])
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as error:
+                item = (time() + self.negative_ttl, error)
+
+            with self.lock:
+                if len(self.items) >= self.maxsize:
+                    self._evict()
+                self.items[key] = item
+
+        if isinstance(item[1], Exception):
+            raise item[1]
+        return item[1]
+
+    def _evict(self):
+        # Remove expired answers, and the answers which expire first if there are still too many
+        now = time()
+        for key in [key for key, item in self.items.items() if item[0] <= now]:
+            del self.items[key]
+        excess = len(self.items) - self.maxsize + 1
+        if excess > 0:
+            for key, _ in sorted(self.items.items(), key=lambda x: x[1][0])[:excess]:
+                del self.items[key]
+
+    def resolve_all(self, domains, rdtype='A', pool=None):
+        """
+        Get the records of several domains at the same time
+
+        Args:
+            domains (list): Domains to resolve
+            rdtype (str): Type of the records (i.e.: A, CNAME)
+            pool (Executor): Pool where the domains are resolved (a new one if it isn't provided)
+
+        Returns:
+            dict: Values of the records of each domain (an empty list if the domain couldn't be resolved)
+        """
+        import dns.exception
+
+        def resolve(domain):
+            try:
+                return self.resolve(domain, rdtype)
+            except dns.exception.DNSException:
+                return []
+
+        domains = list(set(domains))
+        executor = pool or Executor(min(32, max(1, len(domains))))
+        try:
+            return dict(zip(domains, executor.map(resolve, domains)))
+        finally:
+            if pool is None:
+                executor.shutdown(wait=False)
+
+    def clear(self):
+        """Remove all the cached answers"""
+        with self.lock:
+            self.items.clear()
 
 
 class ClsEncoder(json.JSONEncoder):
@@ -57,10 +304,185 @@ class ClsEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime.datetime):
             return int(mktime(obj.timetuple()))
+        # Compact records (awspice.records.Record)
+        if hasattr(obj, 'to_dict'):
+            return obj.to_dict()
 
         return json.JSONEncoder.default(self, obj)
 
 
+class IpRanges:
+    '''
+    Prefix trie of the IP ranges published by AWS (ip-ranges.json) to find the region and service of an IP
+
+    The ranges are downloaded once and saved in a local file, which is downloaded again when it is
+    older than `max_age` seconds. If it can't be downloaded, the saved copy is used.
+    Each lookup walks the bits of the IP through a binary trie (stored in two arrays of children), so
+    it only takes some microseconds and it doesn't need network access.
+
+    Examples:
+        ranges = IpRanges()
+        ranges.lookup('52.95.110.1')        # {'region': 'eu-west-1', 'service': 'ec2'}
+        ranges.lookup_all(['52.95.110.1', '8.8.8.8'])
+
+    Attributes:
+        url: URL of the ip-ranges.json file published by AWS
+        path: Path of the local copy of the file
+        max_age: Seconds after which the local copy is downloaded again
+    '''
+    url = 'https://ip-ranges.amazonaws.com/ip-ranges.json'
+
+    def __init__(self, path='~/.awspice/ip-ranges.json', max_age=7 * 24 * 3600, ranges=None):
+        self.path = os.path.expanduser(path)
+        self.max_age = max_age
+        # Trie for each IP version: Children of each node (bit 0 / bit 1) and value (index) of each node
+        self.tries = {4: (array('i', [0]), array('i', [0]), array('i', [-1])),
+                      6: (array('i', [0]), array('i', [0]), array('i', [-1]))}
+        self.values = list()
+        self._build(ranges or self._load())
+
+    def _load(self):
+        expired = not os.path.exists(self.path) or time() - os.path.getmtime(self.path) > self.max_age
+        if expired:
+            import urllib2
+            try:
+                data = urllib2.urlopen(self.url, timeout=10).read()
+                json.loads(data)
+                if not os.path.exists(os.path.dirname(self.path)):
+                    os.makedirs(os.path.dirname(self.path))
+                with open(self.path, 'w') as f:
+                    f.write(data)
+            # URLError is an IOError
+            except (socket.error, ValueError, IOError, OSError):
+                if not os.path.exists(self.path):
+                    raise
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    @classmethod
+    def _to_int(cls, ip):
+        '''Get the IP version and the integer value of an IP address'''
+        if ':' in ip:
+            return 6, int(binascii.hexlify(socket.inet_pton(socket.AF_INET6, ip)), 16)
+        return 4, struct.unpack('!I', socket.inet_aton(ip))[0]
+
+    def _build(self, ranges):
+        indexes = dict()
+        prefixes = [(p['ip_prefix'], p) for p in ranges.get('prefixes', [])] + \
+                   [(p['ipv6_prefix'], p) for p in ranges.get('ipv6_prefixes', [])]
+
+        for prefix, info in prefixes:
+            ip, length = prefix.split('/')
+            version, value = self._to_int(ip)
+            zeros, ones, nodes = self.tries[version]
+            bits = 32 if version == 4 else 128
+
+            node = 0
+            for position in range(bits - 1, bits - 1 - int(length), -1):
+                children = ones if (value >> position) & 1 else zeros
+                if not children[node]:
+                    children[node] = len(nodes)
+                    zeros.append(0)
+                    ones.append(0)
+                    nodes.append(-1)
+                node = children[node]
+
+            # Same prefix for several services (i.e. AMAZON and EC2): Keep the most specific service
+            region = None if info['region'] == 'GLOBAL' else info['region']
+            service = info['service'].lower()
+            if nodes[node] == -1 or self.values[nodes[node]]['service'] == 'amazon':
+                key = (region, service)
+                if key not in indexes:
+                    indexes[key] = len(self.values)
+                    self.values.append({'region': region, 'service': service})
+                nodes[node] = indexes[key]
+
+    def lookup(self, ip):
+        '''
+        Get the region and service of the longest AWS prefix which contains an IP address
+
+        Args:
+            ip (str): IPv4 or IPv6 address
+
+        Returns:
+            dict: {'region': 'eu-west-1', 'service': 'ec2'} or an empty dict if the IP isn't in AWS
+        '''
+        try:
+            version, value = self._to_int(ip)
+        except (socket.error, ValueError):
+            return {}
+
+        zeros, ones, nodes = self.tries[version]
+        bits = 32 if version == 4 else 128
+        # Region of the longest prefix and service of the longest prefix of a specific service (not AMAZON)
+        node, found, specific = 0, -1, -1
+        for position in range(bits - 1, -2, -1):
+            if nodes[node] != -1:
+                found = nodes[node]
+                if self.values[found]['service'] != 'amazon':
+                    specific = found
+            if position < 0:
+                break
+            node = ones[node] if (value >> position) & 1 else zeros[node]
+            if not node:
+                break
+
+        if found == -1:
+            return {}
+        service = self.values[specific if specific != -1 else found]['service']
+        return {'region': self.values[found]['region'], 'service': service}
+
+    def lookup_all(self, ips):
+        '''
+        Get the region and service of several IP addresses
+
+        Args:
+            ips (list): IPv4 or IPv6 addresses
+
+        Returns:
+            dict: Region and service of each IP address (see `lookup`)
+        '''
+        return dict((ip, self.lookup(ip)) for ip in set(ips))
+
+
+_ip_ranges = None
+_ip_ranges_lock = Lock()
+
+def get_ip_ranges():
+    '''
+    Get the AWS IP ranges shared by all the helpers (loaded on first use)
+
+    Returns:
+        IpRanges: Prefix trie of AWS IP ranges, or None if they couldn't be downloaded
+    '''
+    global _ip_ranges
+    with _ip_ranges_lock:
+        if _ip_ranges is None:
+            try:
+                _ip_ranges = IpRanges()
+            except (socket.error, ValueError, IOError, OSError):
+                # Not downloaded (i.e. without network access) and no local copy: Don't try again
+                _ip_ranges = False
+        return _ip_ranges or None
+
+
+def cidr_range(cidr):
+    '''
+    Get the first and last addresses of a CIDR block (or a single IP address) as integers
+
+    Arguments:
+        cidr: CIDR block (i.e.: 10.0.0.0/8, 2001:db8::/32) or IP address
+
+    Returns:
+        tuple: IP version (4 or 6), first address and last address
+    '''
+    ip, _, length = cidr.partition('/')
+    version, value = IpRanges._to_int(ip)
+    bits = 32 if version == 4 else 128
+    hosts = (1 << (bits - int(length or bits))) - 1
+    return version, value & ~hosts, value | hosts
+
+
 def ip_in_aws(ip):
     '''
     Check if an IP address is from AWS
@@ -92,20 +514,42 @@ def extract_region_from_ip(ip):
         return (False, None)
 
 
+def dnsinfo_from_ips(ips):
+    '''
+    Returns the region and service of several IP addresses at once
+
+    Arguments:
+        ips (list): Addresses of the elements.
+
+    Returns:
+        dict: Info of each address (see `dnsinfo_from_ip`)
+    '''
+    ranges = get_ip_ranges()
+    if ranges:
+        return ranges.lookup_all(ips)
+    return dict((ip, dnsinfo_from_ip(ip)) for ip in set(ips))
+
 
 def dnsinfo_from_ip(ip):
     '''
-    Returns the DNS name of an IP address
+    Returns the region and service of an IP address
+
+    The IP ranges published by AWS are used (see `IpRanges`). If they are not available,
+    the DNS name of the IP address (reverse DNS) is used instead.
 
     Arguments:
         ip: Address of the element.
 
     Examples:
-        dns = get_dnsname_from_ip('8.8.8.8')
+        dns = dnsinfo_from_ip('8.8.8.8')
 
     Returns:
         dict: {'region': 'eu-west-1', 'service': 'ec2'}
     '''
+    ranges = get_ip_ranges()
+    if ranges:
+        return ranges.lookup(ip)
+
     result = {}
     service_matchs = {'compute': 'ec2'}
     try:
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 from servicemanager import ServiceManager
 from modules import *
-from botocore.exceptions import ProfileNotFound, ClientError
 
 
 class AwsManager:
@@ -19,9 +18,18 @@ class AwsManager:
     def service(self):
         return self.aws
 
+    @property
+    def export(self):
+        return ExportModule(self.aws)
+
     @property
     def finder(self):
-        return FinderModule(self.aws)
+        return FinderModule(self.aws, inventory=self.inventory)
+
+    @property
+    def inventory(self):
+        if self._inventory is None: self._inventory = InventoryModule(self.aws)
+        return self._inventory
 
     @property
     def security(self):
@@ -39,6 +47,7 @@ class AwsManager:
         Returns:
             boolean. True if the test was successful, false if it failed.
         """
+        from botocore.exceptions import ProfileNotFound, ClientError
         try:
             self.aws.ec2.get_regions()
             print('[OK] Your awspice is ready to give a helping hand :)')
@@ -51,7 +60,7 @@ class AwsManager:
             return False
 
 
-    def __init__(self, region='eu-west-1', profile=None, access_key=None, secret_key=None):
+    def __init__(self, region='eu-west-1', profile=None, access_key=None, secret_key=None, cache=False, records=False):
         '''
         Initialization and configuration of the client
 
@@ -60,9 +69,14 @@ class AwsManager:
             profile (str): Name of the AWS profile set in ~/.aws/credentials file
             access_key (str): API access key of your AWS account
             secret_key (str): API secret key of your AWS account
+            cache (bool | str | InventoryCache): Store the results of the queries in a local cache
+                                                 (True, path of the SQLite file or an InventoryCache)
+            records (bool): Return compact records (awspice.records.Record) instead of dicts
 
         Returns:
             None
 
         '''
-        self.aws = ServiceManager(region, profile=profile, access_key=access_key, secret_key=secret_key)
+        self._inventory = None
+        self.aws = ServiceManager(region, profile=profile, access_key=access_key, secret_key=secret_key, cache=cache,
+                                  records=records)
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from export import ExportModule
 from finder import FinderModule
+from inventory import InventoryModule
 from security import SecurityModule
 from stats import StatsModule
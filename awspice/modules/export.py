@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+from array import array
+from calendar import timegm
+from itertools import chain
+import json
+
+
+def _tags(element):
+    # Hashable tag set, only encoded (as a JSON object) once for each distinct set (see _Column.categories)
+    return tuple(sorted((tag['Key'], tag.get('Value', '')) for tag in element.get('Tags') or []))
+
+def _timestamp(value):
+    return timegm(value.utctimetuple()) if value else -2 ** 63
+
+def _int64_array():
+    # 'q' (Python 3) or 'l' where it is 64-bit. Python 2 on Windows hasn't a 64-bit typecode ('l' is 32-bit)
+    for typecode in ('q', 'l'):
+        try:
+            if array(typecode).itemsize == 8:
+                return array(typecode)
+        except ValueError:
+            pass
+    return list()
+
+
+class _Column:
+    '''
+    Values of a column stored in a typed array while the elements are received
+
+    Types:
+        str: Strings (None if the value is missing)
+        category: Strings with few distinct values (stored as codes of a dictionary, -1 if the value is missing)
+        int: 64-bit integers (0 if the value is missing)
+        bool: Booleans
+        datetime: Seconds since epoch as 64-bit integers (missing values are stored as NaT)
+    '''
+    def __init__(self, name, type, getter):
+        self.name = name
+        self.type = type
+        self.getter = getter
+        self.dictionary = dict()
+        if type == 'str':
+            self.values = list()
+        elif type == 'category':
+            self.values = array('i')
+        elif type == 'bool':
+            self.values = array('b')
+        else:
+            self.values = _int64_array()
+
+    def extend(self, elements):
+        getter, dictionary, values = self.getter, self.dictionary, list()
+        for element in elements:
+            try:
+                values.append(getter(element))
+            except (KeyError, TypeError, IndexError):
+                values.append(None)
+
+        if self.type == 'category':
+            values = [-1 if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        elif self.type == 'datetime':
+            values = [_timestamp(value) for value in values]
+        elif self.type in ('int', 'bool'):
+            values = [value or 0 for value in values]
+        self.values.extend(values)
+
+    @property
+    def categories(self):
+        values = [value for value, _ in sorted(self.dictionary.items(), key=lambda x: x[1])]
+        return [json.dumps(dict(value), sort_keys=True) if isinstance(value, tuple) else value for value in values]
+
+
+class ExportModule:
+    '''
+    Export resources to columnar formats (NumPy structured arrays or Arrow tables) for analytics
+
+    Results are received page by page and the fields of each element are appended to typed columns,
+    so the list of dicts is never built. Strings with few distinct values (types, states, regions,
+    accounts, tags...) are stored as codes of a dictionary.
+    NumPy (numpy) and Arrow (pyarrow) are optional dependencies: Install the one that you want to use.
+
+    Examples:
+        instances = aws.export.get_instances(output='arrow', regions=aws.service.ec2.get_regions())
+        instances.to_pandas().groupby(['Region', 'InstanceType']).size()
+
+        volumes = aws.export.to_numpy('volumes', aws.finder.find_volumes(profiles='ALL'))
+
+    Attributes:
+        aws: awspice client
+        columns: Name, type and getter of the columns exported for each kind of element
+    '''
+
+    columns = {
+        'instances': [
+            ('InstanceId', 'str', lambda x: x.get('InstanceId')),
+            ('InstanceType', 'category', lambda x: x.get('InstanceType')),
+            ('State', 'category', lambda x: x.get('State', {}).get('Name')),
+            ('LaunchTime', 'datetime', lambda x: x.get('LaunchTime')),
+            ('AvailabilityZone', 'category', lambda x: x.get('Placement', {}).get('AvailabilityZone')),
+            ('VpcId', 'category', lambda x: x.get('VpcId')),
+            ('PrivateIpAddress', 'str', lambda x: x.get('PrivateIpAddress')),
+            ('PublicIpAddress', 'str', lambda x: x.get('PublicIpAddress')),
+            ('TagName', 'str', lambda x: x.get('TagName')),
+            ('Tags', 'category', _tags),
+            ('Region', 'category', lambda x: x.get('Region', {}).get('RegionName')),
+            ('Account', 'category', lambda x: x.get('Authorization', {}).get('Value')),
+        ],
+        'volumes': [
+            ('VolumeId', 'str', lambda x: x.get('VolumeId')),
+            ('VolumeType', 'category', lambda x: x.get('VolumeType')),
+            ('VolumeSize', 'int', lambda x: x.get('Size')),
+            ('Iops', 'int', lambda x: x.get('Iops')),
+            ('State', 'category', lambda x: x.get('State')),
+            ('Encrypted', 'bool', lambda x: x.get('Encrypted')),
+            ('CreateTime', 'datetime', lambda x: x.get('CreateTime')),
+            ('AvailabilityZone', 'category', lambda x: x.get('AvailabilityZone')),
+            ('InstanceId', 'str', lambda x: (x.get('Attachments') or [{}])[0].get('InstanceId')),
+            ('TagName', 'str', lambda x: x.get('TagName')),
+            ('Tags', 'category', _tags),
+            ('Region', 'category', lambda x: x.get('Region', {}).get('RegionName')),
+            ('Account', 'category', lambda x: x.get('Authorization', {}).get('Value')),
+        ],
+    }
+
+    def _build_columns(self, kind, elements):
+        if kind not in self.columns:
+            raise ValueError('Invalid kind of element. Allowed kinds: ' + str(self.columns.keys()))
+
+        columns = [_Column(*column) for column in self.columns[kind]]
+        chunk = list()
+        for element in chain(elements, [None]):
+            if element is not None:
+                # Records (awspice.records.Record) are loaded once, instead of once for each column
+                chunk.append(element.to_dict() if hasattr(element, 'to_dict') else element)
+            if len(chunk) == 1000 or (element is None and chunk):
+                for column in columns:
+                    column.extend(chunk)
+                chunk = list()
+        return columns
+
+    def to_numpy(self, kind, elements):
+        '''
+        Export elements to a NumPy structured array
+
+        Strings are stored as unicode (with the length of the longest value) and datetimes as datetime64[s].
+
+        Args:
+            kind (str): Kind of the elements (i.e.: instances, volumes)
+            elements (iterable): Elements (i.e.: returned by iter_instances or find_instances)
+
+        Raises:
+            ImportError: NumPy is not installed
+
+        Returns:
+            numpy.ndarray: Structured array with a field for each column
+        '''
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy is required to export to NumPy arrays (pip install numpy)')
+
+        fields = list()
+        for column in self._build_columns(kind, elements):
+            if column.type in ('str', 'category'):
+                values = column.values
+                if column.type == 'category':
+                    categories = numpy.array(column.categories + [u''], dtype=unicode)
+                    values = categories[numpy.frombuffer(column.values, dtype=numpy.int32)] if len(column.values) else []
+                fields.append((column.name, numpy.array([value or u'' for value in values], dtype=unicode)))
+            elif column.type == 'datetime':
+                values = column.values
+                if isinstance(values, array) and len(values):
+                    values = numpy.frombuffer(values, dtype=numpy.int64)
+                fields.append((column.name, numpy.array(values, dtype=numpy.int64).view('datetime64[s]')))
+            else:
+                dtype = numpy.bool_ if column.type == 'bool' else numpy.int64
+                fields.append((column.name, numpy.array(column.values, dtype=dtype)))
+
+        result = numpy.empty(len(fields[0][1]), dtype=[(name, values.dtype) for name, values in fields])
+        for name, values in fields:
+            result[name] = values
+        return result
+
+    def to_arrow(self, kind, elements):
+        '''
+        Export elements to an Arrow table
+
+        Category columns are dictionary-encoded and datetimes are timestamps (seconds, UTC).
+
+        Args:
+            kind (str): Kind of the elements (i.e.: instances, volumes)
+            elements (iterable): Elements (i.e.: returned by iter_instances or find_instances)
+
+        Raises:
+            ImportError: PyArrow is not installed
+
+        Returns:
+            pyarrow.Table: Table with a column for each column
+        '''
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('PyArrow is required to export to Arrow tables (pip install pyarrow)')
+
+        arrays, names = list(), list()
+        for column in self._build_columns(kind, elements):
+            if column.type == 'category':
+                indices = pyarrow.array([None if code < 0 else code for code in column.values], type=pyarrow.int32())
+                arrays.append(pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(column.categories,
+                                                                                         type=pyarrow.string())))
+            elif column.type == 'datetime':
+                values = [None if value == -2 ** 63 else value for value in column.values]
+                arrays.append(pyarrow.array(values, type=pyarrow.timestamp('s', tz='UTC')))
+            elif column.type == 'str':
+                arrays.append(pyarrow.array(column.values, type=pyarrow.string()))
+            elif column.type == 'bool':
+                arrays.append(pyarrow.array([bool(value) for value in column.values], type=pyarrow.bool_()))
+            else:
+                arrays.append(pyarrow.array(list(column.values), type=pyarrow.int64()))
+            names.append(column.name)
+        return pyarrow.Table.from_arrays(arrays, names=names)
+
+    def _export(self, kind, elements, output):
+        if output == 'numpy':
+            return self.to_numpy(kind, elements)
+        elif output == 'arrow':
+            return self.to_arrow(kind, elements)
+        raise ValueError('Invalid output format. Allowed formats: numpy, arrow')
+
+    def get_instances(self, output='arrow', regions=[], profiles=[]):
+        '''
+        Export the instances of some accounts and regions as they are received
+
+        Args:
+            output (str): Format of the result (arrow or numpy)
+            regions (list): Regions where to look for the instances
+            profiles (list): Profiles (accounts) where to look for the instances
+
+        Returns:
+            pyarrow.Table | numpy.ndarray: Columns of the instances
+        '''
+        return self._export('instances', self.aws.ec2.iter_instances(regions=regions, profiles=profiles), output)
+
+    def get_volumes(self, output='arrow', regions=[], profiles=[]):
+        '''
+        Export the volumes of some accounts and regions as they are received
+
+        Args:
+            output (str): Format of the result (arrow or numpy)
+            regions (list): Regions where to look for the volumes
+            profiles (list): Profiles (accounts) where to look for the volumes
+
+        Returns:
+            pyarrow.Table | numpy.ndarray: Columns of the volumes
+        '''
+        return self._export('volumes', self.aws.ec2.iter_volumes(regions=regions, profiles=profiles), output)
+
+    def __init__(self, aws):
+        self.aws = aws
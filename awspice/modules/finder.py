@@ -1,13 +1,23 @@
 # -*- coding: utf-8 -*-
-from awspice.helpers import extract_region_from_ip
-from threading import Lock
 
 class FinderModule:
     '''
     This class makes it easy to search for components in AWS.
 
+    Searches in several accounts and regions schedule every (profile, region) pair in the same pool,
+    so they take as long as the slowest of them. The number of tasks running at the same time can be
+    limited globally (`max_workers`) or for each account (`max_workers_per_account`) in the services.
+
+    If the inventory has been loaded (see InventoryModule), instances, volumes and load balancers
+    are found in memory instead of querying AWS.
+
+    Examples:
+        aws.service.ec2.max_workers_per_account = 5
+        instances = aws.finder.find_instances(profiles='ALL')
+
     Attributes:
         aws: awspice client
+        inventory: Inventory used to find elements in memory (if it is loaded)
 
     '''
 
@@ -18,48 +28,25 @@ class FinderModule:
         profiles = self.aws.ec2.parse_profiles(profiles)
         regions = self.aws.ec2.parse_regions(regions, True)
 
-        # CODE SNIPPET from aws.service.ec2.instances.get_instance_by
-        if "publicip" in filters.keys():
-            ip_in_aws, ip_region = extract_region_from_ip(filters['publicip'])
-            
-            if not ip_in_aws:
-                return {}
-
-            # ['eu-west-1', 'eu-west-2']    / 'eu-west-1'
-            # [ {'RegionName': 'eu-west-1'}, {...} ]
-            if isinstance(regions, list):
-                if ip_region in regions or ip_region in regions[0].values():
-                    region = ip_region
-                    
-            # {'eu-west-1': {...}, 'eu-west-2': {...} }
-            if isinstance(regions, dict):
-                if ip_region in regions.keys():
-                    region = ip_region
-
-
-        for account in profiles:
-            self.aws.ec2.change_profile(account)
-            instance = self.aws.ec2.get_instance_by(filters, regions=regions)
-            if instance: return instance
-                
-        return {}
+        if self.inventory and self.inventory.can_search('instances', filters, profiles, regions):
+            return self.inventory.get_by('instances', filters, profiles, regions) or {}
+
+        # Instances found by public IP are searched only in the region of the IP (see get_instances_by)
+        return self.aws.ec2.get_instance_by(filters, regions=regions, profiles=profiles)
 
     def find_instances(self, filters=None, profiles=[], regions=[]):
         '''
         Get instances in different accounts and regions, using search filters.
         '''
-        results = list()
         profiles = self.aws.ec2.parse_profiles(profiles)
         regions = self.aws.ec2.parse_regions(regions, True)
 
+        if self.inventory and self.inventory.can_search('instances', filters, profiles, regions):
+            return self.inventory.get_all_by('instances', filters, profiles, regions)
 
-        for account in profiles:
-            self.aws.ec2.change_profile(account)
-            if filters:
-                results.extend(self.aws.ec2.get_instances_by(filters, regions=regions))
-            else:
-                results.extend(self.aws.ec2.get_instances(regions=regions))
-        return results
+        if filters:
+            return self.aws.ec2.get_instances_by(filters, regions=regions, profiles=profiles)
+        return self.aws.ec2.get_instances(regions=regions, profiles=profiles)
 
     def find_volume(self, filters, profiles=[], regions=[]):
         '''
@@ -68,27 +55,25 @@ class FinderModule:
         profiles = self.aws.ec2.parse_profiles(profiles)
         regions = self.aws.ec2.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.ec2.change_profile(account)
-            volume = self.aws.ec2.get_volume_by(filters, regions=regions)
-            if volume: return volume
-        return None
+        if self.inventory and self.inventory.can_search('volumes', filters, profiles, regions):
+            return self.inventory.get_by('volumes', filters, profiles, regions)
+
+        volume = self.aws.ec2.get_volume_by(filters, regions=regions, profiles=profiles)
+        return volume if volume else None
 
     def find_volumes(self, filters=None, profiles=[], regions=[]):
         '''
         Get group of volumes in different accounts and regions, using search filters.
         '''
-        results = list()
         profiles = self.aws.ec2.parse_profiles(profiles)
         regions = self.aws.ec2.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.ec2.change_profile(account)
-            if filters:
-                results.extend(self.aws.ec2.get_volumes_by(filters, regions=regions))
-            else:
-                results.extend(self.aws.ec2.get_volumes(regions=regions))
-        return results
+        if self.inventory and self.inventory.can_search('volumes', filters, profiles, regions):
+            return self.inventory.get_all_by('volumes', filters, profiles, regions)
+
+        if filters:
+            return self.aws.ec2.get_volumes_by(filters, regions=regions, profiles=profiles)
+        return self.aws.ec2.get_volumes(regions=regions, profiles=profiles)
 
 
     def find_loadbalancer(self, filters, profiles=[], regions=[]):
@@ -98,64 +83,43 @@ class FinderModule:
         profiles = self.aws.elb.parse_profiles(profiles)
         regions = self.aws.elb.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.elb.change_profile(account)
-            elb = self.aws.elb.get_loadbalancer_by(filters, regions=regions)
-            if elb: return elb
-        return None
+        if self.inventory and isinstance(filters, dict):
+            # CNAMEs of load balancers are indexed as DNS names
+            indexed = dict((('dnsname' if k == 'cname' else k), v) for k, v in filters.items())
+            if self.inventory.can_search('loadbalancers', indexed, profiles, regions):
+                return self.inventory.get_by('loadbalancers', indexed, profiles, regions)
+
+        filter_key, filter_value = next(iter(filters.items()))
+        return self.aws.elb.get_loadbalancer_by(filter_key, filter_value, regions=regions, profiles=profiles)
 
 
     def find_loadbalancers(self, filter_key=None, filter_value=None, profiles=[], regions=[]):
         '''
         Get load balancers in different accounts and regions, using search filters.
         '''
-        results = list()
         profiles = self.aws.elb.parse_profiles(profiles)
         regions = self.aws.elb.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.elb.change_profile(account)
-            if filter_key and filter_value:
-                results.extend([self.aws.elb.get_loadbalancer_by(filter_key, filter_value, regions=regions)])
-            else:
-                results.extend(self.aws.elb.get_loadbalancers(regions=regions))
-        return results
+        if not (filter_key and filter_value):
+            return self.aws.elb.get_loadbalancers(regions=regions, profiles=profiles)
+
+        elb = self.aws.elb.get_loadbalancer_by(filter_key, filter_value, regions=regions, profiles=profiles)
+        return [elb] if elb else []
         
     def find_users(self, profiles=[]):
         '''
         Get IAM users in different accounts.
         '''
-        results = list()
         profiles = self.aws.iam.parse_profiles(profiles)
-        lock = Lock()
-
-        def worker(profile):
-            lock.acquire()
-            self.aws.iam.change_profile(profile)
-            lock.release()
-
-            results.extend(self.aws.iam.get_users())
-
-        for profile in profiles: self.aws.iam.pool.add_task(worker, profile)
-        self.aws.iam.pool.wait_completion()
-
-        return results
+        return self.aws.iam.get_users(profiles=profiles)
 
 
     def find_inactive_users(self, profiles=[]):
         '''
         Get inactive users in different accounts
         '''
-
-
-        results = []
         profiles = self.aws.iam.parse_profiles(profiles)
-
-        for profile in profiles:
-            self.aws.iam.change_profile(profile)
-            results.extend(self.aws.iam.get_inactive_users())
-
-        return results
+        return self.aws.iam.get_inactive_users(profiles=profiles)
 
 
 
@@ -163,47 +127,28 @@ class FinderModule:
         '''
         Search S3 buckets in different accounts.
         '''
-        results = list()
         profiles = self.aws.s3.parse_profiles(profiles)
-        lock = Lock()
-
-        def worker(profile):
-            lock.acquire()
-            self.aws.s3.change_profile(profile)
-            lock.release()
-            results.extend(self.aws.s3.get_buckets())
-
-        for profile in profiles: self.aws.s3.pool.add_task(worker, profile)
-        self.aws.s3.pool.wait_completion()
-
-        return results
+        return self.aws.s3.get_buckets(profiles=profiles)
         
     def find_rds_databases(self, profiles=[], regions=[]):
         '''
         Get RDS databases in different accounts and regions.
         '''
-        results = list()
-        profiles = self.aws.ec2.parse_profiles(profiles)
-        regions = self.aws.ec2.parse_regions(regions, True)
+        profiles = self.aws.rds.parse_profiles(profiles)
+        regions = self.aws.rds.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.rds.change_profile(account)
-            results.extend(self.aws.rds.get_databases(regions))
-        return results
+        return self.aws.rds.get_databases(regions, profiles=profiles)
         
     def find_rds_snapshots(self, profiles=[], regions=[]):
         '''
         Get RDS snapshots in different accounts and regions.
         '''
-        results = list()
-        profiles = self.aws.ec2.parse_profiles(profiles)
-        regions = self.aws.ec2.parse_regions(regions, True)
+        profiles = self.aws.rds.parse_profiles(profiles)
+        regions = self.aws.rds.parse_regions(regions, True)
 
-        for account in profiles:
-            self.aws.rds.change_profile(account)
-            results.extend(self.aws.rds.get_snapshots(regions))
-        return results
+        return self.aws.rds.get_snapshots(regions, profiles=profiles)
 
 
-    def __init__(self, aws):
+    def __init__(self, aws, inventory=None):
         self.aws = aws
+        self.inventory = inventory
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+from threading import Lock
+from itertools import chain
+from time import time
+
+
+def _instance_ips(instance, public=False):
+    addresses = list()
+    for interface in instance.get('NetworkInterfaces', []):
+        for address in interface.get('PrivateIpAddresses', []):
+            addresses.append(address.get('Association', {}).get('PublicIp') if public
+                             else address.get('PrivateIpAddress'))
+    addresses.append(instance.get('PublicIpAddress') if public else instance.get('PrivateIpAddress'))
+    return addresses
+
+def _interface_ips(interface, public=False):
+    addresses = [interface.get('Association', {}).get('PublicIp') if public else interface.get('PrivateIpAddress')]
+    for address in interface.get('PrivateIpAddresses', []):
+        addresses.append(address.get('Association', {}).get('PublicIp') if public
+                         else address.get('PrivateIpAddress'))
+    return addresses
+
+def _interface_owner(interface):
+    '''
+    Get the type and id of the resource which owns a network interface, using its attachment,
+    type, requester and description (AWS services describe their interfaces in a known format)
+    '''
+    description = interface.get('Description') or ''
+    interface_type = interface.get('InterfaceType')
+
+    if interface.get('Attachment', {}).get('InstanceId'):
+        return 'instance', interface['Attachment']['InstanceId']
+    if interface_type == 'nat_gateway' or description.startswith('Interface for NAT Gateway '):
+        return 'nat_gateway', description.split(' ')[-1]
+    if description.startswith('ELB '):
+        # Classic: "ELB my-elb" / ALB & NLB: "ELB app/my-alb/1234567890abcdef"
+        name = description[4:]
+        return 'loadbalancer', name.split('/')[1] if '/' in name else name
+    if interface.get('RequesterId') == 'amazon-rds' or description == 'RDSNetworkInterface':
+        return 'database', None
+    if interface_type == 'lambda' or description.startswith('AWS Lambda VPC ENI'):
+        # "AWS Lambda VPC ENI-my-function-<uuid>"
+        name = description[len('AWS Lambda VPC ENI'):].strip(' -:')
+        return 'lambda', name[:-37] if len(name) > 37 else name
+    if description.startswith('EFS mount target for '):
+        return 'efs', description.split(' ')[4]
+    if interface_type == 'vpc_endpoint':
+        return 'vpc_endpoint', description.split(' ')[-1]
+    return 'network_interface', interface['NetworkInterfaceId']
+
+
+class InventoryModule:
+    '''
+    In-memory inventory of instances, volumes, network interfaces, load balancers and databases
+
+    All the elements are loaded once (for all the accounts and regions requested) and indexed by
+    their id, IPs, DNS names and Name tag, so each lookup is a dictionary access instead of a query
+    to AWS. The inventory can be reloaded every `refresh_interval` seconds.
+    Network interfaces are indexed too, so the resource of any type which uses an IP address can be
+    found (see `get_owner_by_ip`).
+    When the inventory is loaded, FinderModule uses it to find instances, volumes, load balancers
+    and databases.
+
+    Examples:
+        aws.inventory.load(profiles='ALL', refresh_interval=600)
+        instance = aws.inventory.get_by('instances', {'privateip': '10.0.0.1'})
+        instance = aws.finder.find_instance({'publicip': '52.1.2.3'})
+        owner = aws.inventory.get_owner_by_ip('10.2.3.4')
+
+    Attributes:
+        aws: awspice client
+        indexes: Functions which return the values to index for each kind of element and key
+        elements: Elements loaded of each kind (None if the inventory hasn't been loaded)
+        accounts: Accounts loaded, as they are stored in the Authorization of the elements
+        refresh_interval: Seconds after which the inventory is reloaded (None to never reload it)
+    '''
+
+    indexes = {
+        'instances': {
+            'id': lambda x: [x['InstanceId']],
+            'privateip': lambda x: _instance_ips(x),
+            'publicip': lambda x: _instance_ips(x, public=True),
+            'dnsname': lambda x: [x.get('PublicDnsName'), x.get('PrivateDnsName')],
+            'name': lambda x: [x.get('TagName')],
+            'tagname': lambda x: [x.get('TagName')],
+        },
+        'volumes': {
+            'id': lambda x: [x['VolumeId']],
+            'instance': lambda x: [attachment.get('InstanceId') for attachment in x.get('Attachments', [])],
+            'tagname': lambda x: [x.get('TagName')],
+        },
+        'network_interfaces': {
+            'id': lambda x: [x['NetworkInterfaceId']],
+            'privateip': lambda x: _interface_ips(x),
+            'publicip': lambda x: _interface_ips(x, public=True),
+            'dnsname': lambda x: [x.get('PrivateDnsName'), x.get('Association', {}).get('PublicDnsName')],
+            'instance': lambda x: [x.get('Attachment', {}).get('InstanceId')],
+        },
+        'loadbalancers': {
+            'id': lambda x: [x['LoadBalancerName']],
+            'dnsname': lambda x: [x.get('DNSName')],
+            'tagname': lambda x: [x['LoadBalancerName']],
+        },
+        'databases': {
+            'id': lambda x: [x['DBInstanceIdentifier']],
+            'dnsname': lambda x: [x.get('Endpoint', {}).get('Address')],
+        },
+    }
+
+    # DNS names are case insensitive
+    insensitive_keys = ['dnsname']
+
+    def _load_elements(self, kind):
+        services = {
+            'instances': self.aws.ec2.iter_instances,
+            'volumes': self.aws.ec2.iter_volumes,
+            'network_interfaces': self.aws.ec2.iter_network_interfaces,
+            'loadbalancers': self.aws.elb.iter_loadbalancers,
+            'databases': self.aws.rds.iter_databases,
+        }
+        elements = services[kind](regions=self.regions, profiles=self.profiles)
+        if kind == 'loadbalancers':
+            elements = chain(elements, self.aws.elb.iter_loadbalancers_v2(regions=self.regions, profiles=self.profiles))
+        return elements
+
+    def _get_accounts(self, profiles):
+        # Accounts as AwsBase.inject_client_vars stores them: Profile, access key or 'default'
+        # (a None profile means the current credentials)
+        accounts = list()
+        for profile in self.aws.ec2.parse_profiles(profiles):
+            if not profile:
+                context = self.aws.ec2.get_context()
+                profile = context.profile or context.access_key
+            accounts.append(profile or 'default')
+        return accounts
+
+    def _build_indexes(self, kind, elements):
+        indexes = dict((key, dict()) for key in self.indexes[kind])
+        for element in elements:
+            for key, values in self.indexes[kind].items():
+                for value in set(values(element)):
+                    if not value:
+                        continue
+                    if key in self.insensitive_keys:
+                        value = value.lower()
+                    indexes[key].setdefault(value, []).append(element)
+        return indexes
+
+    def load(self, profiles=[], regions=[], refresh_interval=None):
+        '''
+        Load all the elements of some accounts and regions and index them
+
+        Args:
+            profiles (list): Profiles (accounts) to load. Current profile by default.
+            regions (list): Regions to load. All regions by default.
+            refresh_interval (int): Seconds after which the inventory is reloaded (None to never reload it)
+
+        Returns:
+            InventoryModule: The inventory itself
+        '''
+        self.profiles = self.aws.ec2.parse_profiles(profiles)
+        self.accounts = self._get_accounts(self.profiles)
+        self.regions = self.aws.ec2.parse_regions(regions, True)
+        self.refresh_interval = refresh_interval
+        self.refresh()
+        return self
+
+    def refresh(self):
+        '''
+        Reload all the elements of the accounts and regions of the inventory
+        '''
+        elements, indexes = dict(), dict()
+        for kind in self.indexes:
+            elements[kind] = list(self._load_elements(kind))
+            indexes[kind] = self._build_indexes(kind, elements[kind])
+
+        # Replaced at once, so lookups running meanwhile use the old inventory
+        self.elements, self._indexes, self.loaded_at = elements, indexes, time()
+
+    @property
+    def loaded(self):
+        return self.elements is not None
+
+    def _check_refresh(self):
+        if not self.loaded:
+            raise ValueError('The inventory has not been loaded. Use load() first.')
+
+        if self.refresh_interval and time() - self.loaded_at > self.refresh_interval:
+            with self.lock:
+                if time() - self.loaded_at > self.refresh_interval:
+                    self.refresh()
+
+    def can_search(self, kind, filters, profiles=[], regions=[]):
+        '''
+        Check if a search can be answered by the inventory: It is loaded, all the filters are indexed
+        for the kind of element and the profiles and regions to search have been loaded
+
+        Args:
+            kind (str): Kind of element (i.e.: instances, volumes, network_interfaces, loadbalancers, databases)
+            filters (dict): Filters to search
+            profiles (list): Profiles to search. Current profile by default.
+            regions (list): Regions to search. All regions by default.
+
+        Returns:
+            bool
+        '''
+        if not (self.loaded and isinstance(filters, dict) and filters):
+            return False
+        if not all(key in self.indexes[kind] for key in filters):
+            return False
+
+        accounts = self._get_accounts(profiles)
+        regions = [region['RegionName'] for region in self.aws.ec2.parse_regions(regions, True)]
+        return (set(accounts) <= set(self.accounts)
+                and set(regions) <= set(region['RegionName'] for region in self.regions))
+
+    def get_elements(self, kind):
+        '''
+        Get all the elements of a kind
+
+        Args:
+            kind (str): Kind of element (i.e.: instances, volumes, network_interfaces, loadbalancers, databases)
+
+        Returns:
+            list: List of elements
+        '''
+        self._check_refresh()
+        return self.elements[kind]
+
+    def get_all_by(self, kind, filters, profiles=[], regions=[]):
+        '''
+        Get all the elements of a kind which match with all the filters
+
+        Args:
+            kind (str): Kind of element (i.e.: instances, volumes, network_interfaces, loadbalancers, databases)
+            filters (dict): Indexed keys and values (i.e.: {'privateip': '10.0.0.1'})
+            profiles (list): Return only elements of these profiles
+            regions (list): Return only elements of these regions
+
+        Raises:
+            ValueError: Filter is not indexed for this kind of element
+
+        Returns:
+            list: List of elements
+        '''
+        self._check_refresh()
+        results = None
+        for key, value in filters.items():
+            if key not in self.indexes[kind]:
+                raise ValueError('Invalid filter key. Allowed filters: ' + str(self.indexes[kind].keys()))
+            if key in self.insensitive_keys:
+                value = value.lower()
+
+            found = self._indexes[kind][key].get(value, [])
+            if results is None:
+                results = found
+            else:
+                found = set(id(x) for x in found)
+                results = [x for x in results if id(x) in found]
+
+        if profiles:
+            accounts = self._get_accounts(profiles)
+            results = [x for x in results if x['Authorization']['Value'] in accounts]
+        if regions:
+            regions = [region['RegionName'] for region in self.aws.ec2.parse_regions(regions)]
+            results = [x for x in results if x['Region']['RegionName'] in regions]
+        return list(results or [])
+
+    def get_by(self, kind, filters, profiles=[], regions=[]):
+        '''
+        Get the first element of a kind which matches with all the filters
+
+        Args:
+            kind (str): Kind of element (i.e.: instances, volumes, network_interfaces, loadbalancers, databases)
+            filters (dict): Indexed keys and values (i.e.: {'privateip': '10.0.0.1'})
+            profiles (list): Return only elements of these profiles
+            regions (list): Return only elements of these regions
+
+        Returns:
+            dict: Element found or None
+        '''
+        return next(iter(self.get_all_by(kind, filters, profiles, regions)), None)
+
+    def get_owner_by_ip(self, ip, profiles=[], regions=[]):
+        '''
+        Get the resource which uses an IP address (private or public), whatever its type is
+
+        The network interface (ENI) with the IP is found in the inventory, and its owner is identified:
+        Instances, load balancers, RDS databases, NAT gateways, Lambda functions, EFS mount targets or
+        VPC endpoints. Instances and load balancers are returned too, if they are in the inventory.
+
+        Args:
+            ip (str): Private or public IP address
+            profiles (list): Search only in these profiles
+            regions (list): Search only in these regions
+
+        Examples:
+            owner = aws.inventory.get_owner_by_ip('10.2.3.4')
+            print owner['ResourceType'], owner['ResourceId']
+
+        Returns:
+            dict: ResourceType, ResourceId, Resource (or None) and NetworkInterface. None if the IP isn't found.
+        '''
+        interface = self.get_by('network_interfaces', {'privateip': ip}, profiles, regions) or \
+                    self.get_by('network_interfaces', {'publicip': ip}, profiles, regions)
+        if not interface:
+            return None
+
+        resource_type, resource_id = _interface_owner(interface)
+        kinds = {'instance': 'instances', 'loadbalancer': 'loadbalancers'}
+        resource = None
+        if resource_type in kinds:
+            resource = self.get_by(kinds[resource_type], {'id': resource_id}, profiles, regions)
+
+        return {'ResourceType': resource_type,
+                'ResourceId': resource_id,
+                'Resource': resource,
+                'NetworkInterface': interface}
+
+    def get_owners_by_ips(self, ips, profiles=[], regions=[]):
+        '''
+        Get the resources which use several IP addresses
+
+        Args:
+            ips (list): Private or public IP addresses
+            profiles (list): Search only in these profiles
+            regions (list): Search only in these regions
+
+        Returns:
+            dict: Owner of each IP address (see `get_owner_by_ip`)
+        '''
+        return dict((ip, self.get_owner_by_ip(ip, profiles, regions)) for ip in set(ips))
+
+    def __init__(self, aws):
+        self.aws = aws
+        self.elements = None
+        self.profiles = []
+        self.accounts = []
+        self.regions = []
+        self.refresh_interval = None
+        self.lock = Lock()
@@ -1,73 +1,462 @@
 # -*- coding: utf-8 -*-
+from collections import deque
+from threading import Lock
+from awspice.helpers import cidr_range
 from .finder import FinderModule
+from .inventory import _interface_owner
+
+
+def _secgroup_rules(secgroup):
+    rules = list()
+    for rule in secgroup.get("IpPermissions", []):
+        rules.append({'ToPort'   : rule.get("ToPort", ''),
+                      'FromPort' : rule.get("FromPort", ''),
+                      'Protocol' : rule.get("IpProtocol", '') if rule.get("IpProtocol", '') != '-1' else 'ALL',
+                      'IpRange'  : [iprange["CidrIp"] for iprange in rule.get("IpRanges", '')]})
+    return rules
+
+def _join_secgroups(instance, rules):
+    '''Copy of an instance with the rules of each of its security groups (taken from a GroupId -> rules map)'''
+    ins_element = instance.to_dict() if hasattr(instance, 'to_dict') else dict(instance)
+    ins_element['SecurityGroups'] = list()
+    for securitygroup in instance['SecurityGroups']:
+        sg_element = dict(securitygroup)
+        sg_element['Rules'] = rules.get(securitygroup["GroupId"], [])
+        ins_element['SecurityGroups'].append(sg_element)
+    return ins_element
+
+def _secgroup_key(element, group_id):
+    return (element['Authorization']['Value'], element['Region']['RegionName'], group_id)
+
+# Number of each protocol name (rules use names or numbers, -1 is any protocol)
+_protocols = {'tcp': 6, 'udp': 17, 'icmp': 1, 'icmpv6': 58, 'all': -1}
+
+def _protocol(protocol):
+    protocol = str(protocol).lower()
+    return int(_protocols.get(protocol, protocol))
+
+def _rule_ports(rule):
+    '''Protocol number and port range of a rule (all the ports if the rule allows any protocol or port)'''
+    protocol = _protocol(rule.get('IpProtocol', '-1'))
+    from_port, to_port = rule.get('FromPort', -1), rule.get('ToPort', -1)
+    if protocol == -1 or from_port == -1:
+        from_port, to_port = 0, 65535
+    return protocol, from_port, to_port
+
+def _allows(rule_ports, port, protocol):
+    rule_protocol, from_port, to_port = rule_ports
+    return (port is None or from_port <= port <= to_port) and \
+           (protocol is None or rule_protocol == -1 or rule_protocol == _protocol(protocol))
+
+
+class ExposureIndex(object):
+    '''
+    Interval index of the rules of security groups over (CIDR range, port range, protocol)
+
+    Each rule (CIDR of IpRanges / Ipv6Ranges) is stored as a row of NumPy arrays (first and last address,
+    first and last port, protocol and security group), sorted by its first address. A query only scans the
+    rows which start before the source (binary search) and compares them all at once, so it answers
+    which security groups and instances are exposed to a source over millions of rules.
+    NumPy is required (optional dependency of awspice).
+
+    Examples:
+        index = aws.security.get_exposure_index(profiles='ALL', regions=aws.service.ec2.get_regions())
+        instances = index.get_exposed_instances(22, 'tcp', '0.0.0.0/0')
+        exposed = index.get_exposed_all([(22, 'tcp', '0.0.0.0/0'), (3389, 'tcp', '203.0.113.0/24')])
+
+    Attributes:
+        secgroups: Security groups indexed
+        instances: Instances which use each security group (by account, region and GroupId)
+    '''
+
+    def __init__(self, secgroups, instances=[]):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy is required to build the exposure index (pip install numpy)')
+        self.numpy = numpy
+
+        self.secgroups = list()
+        ranges = dict()
+        columns = {4: tuple(list() for _ in range(6)), 6: tuple(list() for _ in range(6))}
+        for secgroup in secgroups:
+            for rule in secgroup.get('IpPermissions', []):
+                protocol, from_port, to_port = _rule_ports(rule)
+                cidrs = [r['CidrIp'] for r in rule.get('IpRanges', [])] + \
+                        [r['CidrIpv6'] for r in rule.get('Ipv6Ranges', [])]
+                for cidr in cidrs:
+                    # The same blocks (i.e.: 0.0.0.0/0 or the VPC ranges) are used by many rules
+                    if cidr not in ranges:
+                        ranges[cidr] = cidr_range(cidr)
+                    version, first, last = ranges[cidr]
+                    firsts, lasts, from_ports, to_ports, protocols, groups = columns[version]
+                    firsts.append(first)
+                    lasts.append(last)
+                    from_ports.append(from_port)
+                    to_ports.append(to_port)
+                    protocols.append(protocol)
+                    groups.append(len(self.secgroups))
+            self.secgroups.append(secgroup)
+
+        # IPv6 addresses don't fit in int64: They are compared as Python integers (object arrays)
+        self.rules = dict()
+        for version, (firsts, lasts, from_ports, to_ports, protocols, groups) in columns.items():
+            address_type = numpy.int64 if version == 4 else object
+            firsts = numpy.array(firsts, dtype=address_type)
+            order = numpy.argsort(firsts, kind='mergesort')
+            self.rules[version] = (firsts[order],
+                                   numpy.array(lasts, dtype=address_type)[order],
+                                   numpy.array(from_ports, dtype=numpy.int32)[order],
+                                   numpy.array(to_ports, dtype=numpy.int32)[order],
+                                   numpy.array(protocols, dtype=numpy.int16)[order],
+                                   numpy.array(groups, dtype=numpy.int32)[order])
+
+        self.instances = dict()
+        for instance in instances:
+            groups = set(sg['GroupId'] for sg in instance.get('SecurityGroups', []))
+            groups.update(sg['GroupId'] for eni in instance.get('NetworkInterfaces', []) for sg in eni.get('Groups', []))
+            for group_id in groups:
+                self.instances.setdefault(_secgroup_key(instance, group_id), []).append(instance)
+
+    def _match(self, port, protocol, source, match):
+        version, first, last = cidr_range(source)
+        firsts, lasts, from_ports, to_ports, protocols, groups = self.rules[version]
+
+        # Rules are sorted by their first address: Only the rules which start before the source can match
+        count = self.numpy.searchsorted(firsts, first if match == 'all' else last, side='right')
+        if match == 'all':
+            # The rule allows every address of the source
+            mask = lasts[:count] >= last
+        else:
+            # The rule allows some address of the source
+            mask = lasts[:count] >= first
+        if port is not None:
+            mask &= (from_ports[:count] <= port) & (to_ports[:count] >= port)
+        if protocol is not None:
+            protocol = _protocol(protocol)
+            mask &= (protocols[:count] == protocol) | (protocols[:count] == -1)
+        return self.numpy.unique(groups[:count][mask])
+
+    def get_exposed_secgroups(self, port=None, protocol='tcp', source='0.0.0.0/0', match='all'):
+        '''
+        Get the security groups which allow traffic from a source to a port
+
+        Args:
+            port (int): Destination port (None for any port)
+            protocol (str): Protocol name or number (i.e.: tcp, udp, icmp, 6). None for any protocol
+            source (str): Source CIDR block or IP address (i.e.: 0.0.0.0/0, 203.0.113.0/24)
+            match (str): 'all' if every address of the source must be allowed, 'any' if some address is enough
+
+        Returns:
+            list: Security groups
+        '''
+        return [self.secgroups[group] for group in self._match(port, protocol, source, match)]
+
+    def get_exposed_instances(self, port=None, protocol='tcp', source='0.0.0.0/0', match='all'):
+        '''
+        Get the instances which are reachable from a source on a port (see `get_exposed_secgroups`)
+
+        Returns:
+            list: Instances with a security group which allows the traffic
+        '''
+        instances = dict()
+        for secgroup in self.get_exposed_secgroups(port, protocol, source, match):
+            for instance in self.instances.get(_secgroup_key(secgroup, secgroup['GroupId']), []):
+                instances[id(instance)] = instance
+        return instances.values()
+
+    def get_exposed_all(self, queries, match='all'):
+        '''
+        Get the instances which are reachable for several (port, protocol, source) queries
+
+        Args:
+            queries (list): Tuples of port, protocol and source (i.e.: [(22, 'tcp', '0.0.0.0/0')])
+            match (str): 'all' if every address of the source must be allowed, 'any' if some address is enough
+
+        Returns:
+            dict: Instances reachable for each query
+        '''
+        return dict((query, self.get_exposed_instances(*query, match=match)) for query in set(queries))
+
+
+class SecgroupGraph(object):
+    '''
+    Graph of the references between the security groups of a VPC (rules with UserIdGroupPairs)
+
+    There is an edge from a group A to a group B when a rule of B allows traffic from A. Network interfaces
+    (ENIs) are the members of the groups: Whoever controls an interface of B (reached from A) can use every
+    group of that interface to keep moving. The groups which can be controlled from each source group
+    (transitive closure) are computed once, on first use, and cached, so audits run locally.
+
+    Examples:
+        graph = aws.security.get_secgroup_graph('vpc-1a2b3c4d', regions=['eu-west-1'])
+        path = graph.can_reach('sg-web', 'sg-database', port=5432)   # [('sg-web', 'sg-app'), ('sg-app', 'sg-database')]
+        members = graph.get_members('sg-database')                   # [{'ResourceType': 'database', ...}]
+
+    Attributes:
+        secgroups: Security groups of the graph by GroupId
+        interfaces: Network interfaces of each security group
+        edges: Groups whose rules allow traffic from each group (target GroupId, protocol, from port, to port)
+        ingress: Groups allowed by the rules of each group (source GroupId, protocol, from port, to port)
+    '''
+    def __init__(self, secgroups, interfaces=[]):
+        self.secgroups = dict()
+        self.edges, self.ingress = dict(), dict()
+        for secgroup in secgroups:
+            self.secgroups[secgroup['GroupId']] = secgroup
+            for rule in secgroup.get('IpPermissions', []):
+                ports = _rule_ports(rule)
+                for pair in rule.get('UserIdGroupPairs', []):
+                    self.edges.setdefault(pair['GroupId'], []).append((secgroup['GroupId'],) + ports)
+                    self.ingress.setdefault(secgroup['GroupId'], []).append((pair['GroupId'],) + ports)
+
+        # Groups of the interfaces of each group: Controlling a member of a group gives all of them
+        self.interfaces, self.cogroups = dict(), dict()
+        for interface in interfaces:
+            groups = [group['GroupId'] for group in interface.get('Groups', [])]
+            for group in groups:
+                self.interfaces.setdefault(group, []).append(interface)
+                self.cogroups.setdefault(group, set()).update(groups)
+
+        self._closures = dict()
+        self._lock = Lock()
+
+    def get_closure(self, source):
+        '''
+        Get the groups which can be controlled from a group, following references on any port
+
+        Args:
+            source (str): GroupId of the source group
+
+        Returns:
+            dict: Hop (source and target GroupId) through which each group is controlled (None for the source)
+        '''
+        with self._lock:
+            if source in self._closures:
+                return self._closures[source]
+
+        hops = {source: None}
+        pending = deque([source])
+        while pending:
+            group = pending.popleft()
+            for target, _, _, _ in self.edges.get(group, []):
+                for controlled in self.cogroups.get(target, ()):
+                    if controlled not in hops:
+                        hops[controlled] = (group, target)
+                        pending.append(controlled)
+
+        with self._lock:
+            self._closures[source] = hops
+        return hops
+
+    def _path(self, hops, group):
+        path = list()
+        while hops[group] is not None:
+            path.insert(0, hops[group])
+            group = hops[group][0]
+        return path
+
+    def can_reach(self, source, target, port=None, protocol='tcp', transitive=True):
+        '''
+        Check if the members of a group can reach the members of another group on a port
+
+        Args:
+            source (str): GroupId of the source group
+            target (str): GroupId of the target group
+            port (int): Destination port (None for any port)
+            protocol (str): Protocol name or number (None for any protocol)
+            transitive (bool): Follow the groups controlled through other groups, not only the direct rules
+
+        Returns:
+            list: Hops (source and target GroupId) of a path, or None if the target can't be reached
+        '''
+        hops = self.get_closure(source) if transitive else {source: None}
+        for group, rule_protocol, from_port, to_port in self.ingress.get(target, []):
+            if group in hops and _allows((rule_protocol, from_port, to_port), port, protocol):
+                return self._path(hops, group) + [(group, target)]
+        return None
+
+    def get_reachable(self, source, port=None, protocol='tcp', transitive=True):
+        '''
+        Get the groups whose members can be reached from a group on a port
+
+        Args:
+            source (str): GroupId of the source group
+            port (int): Destination port (None for any port)
+            protocol (str): Protocol name or number (None for any protocol)
+            transitive (bool): Follow the groups controlled through other groups, not only the direct rules
+
+        Returns:
+            set: GroupIds of the groups reachable
+        '''
+        hops = self.get_closure(source) if transitive else {source: None}
+        return set(target for group in hops for target, rule_protocol, from_port, to_port in self.edges.get(group, [])
+                   if _allows((rule_protocol, from_port, to_port), port, protocol))
+
+    def get_members(self, group):
+        '''
+        Get the resources which use a group, identified by their network interfaces
+
+        Args:
+            group (str): GroupId
+
+        Returns:
+            list: ResourceType, ResourceId and NetworkInterface of each member (see InventoryModule.get_owner_by_ip)
+        '''
+        members = list()
+        for interface in self.interfaces.get(group, []):
+            resource_type, resource_id = _interface_owner(interface)
+            members.append({'ResourceType': resource_type, 'ResourceId': resource_id, 'NetworkInterface': interface})
+        return members
+
 
 class SecurityModule:
     '''
     This class facilitates methods for securing the AWS account
 
     Methods are available to help improve AWS account security by detecting bad configurations.
+    The security groups of each account and region are requested once and joined in memory with
+    its instances, instead of requesting the security groups of each instance.
+
+    Attributes:
+        aws: awspice client
     '''
 
-    @classmethod
-    def get_instance_portlisting(cls, aws, instanceid):
+    def get_instance_portlisting(self, instanceid, profiles=[], regions=[]):
         '''
         List SecurityGroups and rules for an instance
 
         Args:
-            aws: AwsManager client
             instanceid: Id of instance to analyze
+            profiles (lst): Profiles (accounts) where to look for the instance
+            regions (lst): Regions where to look for the instance
 
         Return:
             Dictionary with instance and its SecurityGroups
         '''
-        results = dict()
-        instance = FinderModule(aws).find_instance(aws, 'id', instanceid)
-        results.update(instance)
+        instance = FinderModule(self.aws).find_instance({'id': instanceid}, profiles=profiles, regions=regions)
+        if not instance:
+            return {'Instance': {}}
+
+        # All the security groups of the instance in a single request, in its account and region
+        authorization = instance['Authorization']
+        secgroups = self.aws.ec2.get_secgroups_by({'id': [sg['GroupId'] for sg in instance['SecurityGroups']]},
+                                                  regions=[instance['Region']['RegionName']],
+                                                  profiles=[authorization['Value']] if authorization['Type'] == 'Profile' else [])
+        rules = dict((secgroup['GroupId'], _secgroup_rules(secgroup)) for secgroup in secgroups)
+        return {'Instance': _join_secgroups(instance, rules)}
+
+    def iter_portlisting(self, regions=[], profiles=[]):
+        '''
+        Iterate over the instances with the rules of their SecurityGroups as they are received
+
+        All the accounts and regions are analyzed in parallel. Each task requests all the security groups
+        of its account and region (page by page) and joins them with the instances of the same account
+        and region, so there is only one `describe_security_groups` pagination per (account, region).
+
+        Args:
+            regions (lst): Regions to analyze
+            profiles (lst): Profiles (accounts) to analyze
+
+        Yields:
+            dict: Instance with its SecurityGroups and their Rules
+        '''
+        ec2 = self.aws.ec2
 
-        results['SecurityGroups'] = list()
-        for secgroup in instance["SecurityGroups"]:
-            sg = secgroup
-            sg['Rules'] = list()
-            for rule in aws.ec2.get_secgroup_by('id', secgroup["GroupId"])["IpPermissions"]:
-                sg['Rules'].append({
-                    'FromPort' : rule.get("FromPort", ''),
-                    'ToPort'   : rule.get("ToPort", ''),
-                    'Protocol' : rule.get("IpProtocol", '') if rule.get("IpProtocol", '') != '-1' else 'ALL',
-                    'IpRange'  : [iprange["CidrIp"] for iprange in rule.get("IpRanges", '')]
-                })
-            results['SecurityGroups'].append(sg)
+        def worker(context):
+            rules = dict()
+            for page in context.paginate('describe_security_groups'):
+                for secgroup in page['SecurityGroups']:
+                    rules[secgroup['GroupId']] = _secgroup_rules(secgroup)
 
-        return {'Instance': results}
+            for page in context.paginate('describe_instances'):
+                instances = [instance for reservation in page['Reservations'] for instance in reservation['Instances']]
+                instances = ec2.inject_client_vars(instances, context.client_vars)
+                yield [_join_secgroups(instance, rules) for instance in instances]
 
-    @classmethod
-    def get_region_portlisting(cls, aws, region):
+        return ec2.fanout(worker, regions=regions, profiles=profiles, stream=True)
+
+    def get_regions_portlisting(self, regions=[], profiles=[]):
+        '''
+        List SecurityGroups and rules for all instances in several regions and accounts
+
+        Args:
+            regions (lst): Regions to analyze
+            profiles (lst): Profiles (accounts) to analyze
+
+        Return:
+            List of regions with its instances and their SecurityGroups
+        '''
+        results = dict((region['RegionName'], list()) for region in self.aws.ec2.parse_regions(regions))
+        for instance in self.iter_portlisting(regions=regions, profiles=profiles):
+            results[instance['Region']['RegionName']].append(instance)
+        return [{'RegionName': region, 'Instances': instances} for region, instances in results.items()]
+
+    def get_region_portlisting(self, region, profiles=[]):
         '''
         List SecurityGroups and rules for all instances in region
 
         Args:
-            aws: AwsManager client
             region: Region to analyze
+            profiles (lst): Profiles (accounts) to analyze
 
         Return:
             Dictionary with regions, instances and its SecurityGroups
         '''
-        results = []
-        aws.ec2.change_region(region)
-
-        for instance in aws.ec2.get_instances():
-            ins_element = dict()
-            ins_element.update(instance)
-            ins_element['SecurityGroups'] = list()
-            for securitygroup in instance['SecurityGroups']:
-                sg_element = dict()
-                sg_element.update(securitygroup)
-                sg_element['Rules'] = list()
-                for rule in aws.ec2.get_secgroup_by('id', securitygroup["GroupId"])["IpPermissions"]:
-                    sg_element['Rules'].append({'ToPort'   : rule.get("ToPort", ''),
-                                                'FromPort' : rule.get("FromPort", ''),
-                                                'Protocol' : rule.get("IpProtocol", '') if rule.get("IpProtocol", '') != '-1' else 'ALL',
-                                                'IpRange'  : [iprange["CidrIp"] for iprange in rule.get("IpRanges", '')]})
-                ins_element['SecurityGroups'].append(sg_element)
-            results.append(ins_element)
-
-        return {'RegionName': region, 'Instances': results}
+        return {'RegionName': region, 'Instances': list(self.iter_portlisting(regions=[region], profiles=profiles))}
+
+    def get_exposure_index(self, regions=[], profiles=[]):
+        '''
+        Load the rules of all the security groups and the instances of several accounts and regions into
+        an interval index, to find which instances are exposed to a source on a port (see `ExposureIndex`)
+
+        Args:
+            regions (lst): Regions to analyze
+            profiles (lst): Profiles (accounts) to analyze
+
+        Return:
+            ExposureIndex
+        '''
+        secgroups = self.aws.ec2.iter_secgroups(regions=regions, profiles=profiles)
+        instances = self.aws.ec2.iter_instances(regions=regions, profiles=profiles)
+        return ExposureIndex(secgroups, instances)
+
+    def get_secgroup_graph(self, vpc, regions=[], profiles=[]):
+        '''
+        Build the graph of references between the security groups of a VPC (see `SecgroupGraph`)
+
+        Args:
+            vpc (str): VpcId
+            regions (lst): Regions where to look for the VPC
+            profiles (lst): Profiles (accounts) where to look for the VPC
+
+        Return:
+            SecgroupGraph
+        '''
+        secgroups = self.aws.ec2.iter_secgroups_by({'vpc': vpc}, regions=regions, profiles=profiles)
+        interfaces = self.aws.ec2.get_network_interfaces_by({'vpc': vpc}, regions=regions, profiles=profiles)
+        return SecgroupGraph(secgroups, interfaces)
+
+    def get_secgroup_graphs(self, regions=[], profiles=[]):
+        '''
+        Build the graph of references between the security groups of every VPC of several accounts and regions
+
+        Args:
+            regions (lst): Regions to analyze
+            profiles (lst): Profiles (accounts) to analyze
+
+        Return:
+            dict: SecgroupGraph of each (account, region, VpcId)
+        '''
+        def vpc_key(element):
+            return element['Authorization']['Value'], element['Region']['RegionName'], element.get('VpcId')
+
+        secgroups, interfaces = dict(), dict()
+        for secgroup in self.aws.ec2.iter_secgroups(regions=regions, profiles=profiles):
+            secgroups.setdefault(vpc_key(secgroup), []).append(secgroup)
+        for interface in self.aws.ec2.iter_network_interfaces(regions=regions, profiles=profiles):
+            interfaces.setdefault(vpc_key(interface), []).append(interface)
+        return dict((key, SecgroupGraph(groups, interfaces.get(key, []))) for key, groups in secgroups.items())
+
+    def __init__(self, aws):
+        self.aws = aws
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from collections import deque
+from functools import partial
+
 
 class StatsModule:
     '''
@@ -10,63 +13,295 @@ class StatsModule:
         aws: awspice client
     '''
 
+    # CONCURRENCY LIMIT: (region, service) tasks of get_stats running at the same time (pool size by default)
+    max_workers = None
+
+    def _run_tasks(self, tasks):
+        '''
+        Run (region, key, function) tasks in the pool of EC2 and yield (region, key, result) as they finish
+        '''
+        pool = self.aws.ec2.pool
+        max_workers = self.max_workers or pool.size
+        tasks, running = deque(tasks), dict()
+        try:
+            while tasks or running:
+                while tasks and len(running) < max_workers:
+                    region, key, function = tasks.popleft()
+                    running[pool.submit(function)] = (region, key)
+
+                future = next(pool.as_completed(running.keys()))
+                region, key = running.pop(future)
+                yield region, key, future.result()
+        finally:
+            # A task failed or the consumer stopped iterating: Pending tasks are not launched
+            for future in running:
+                future.cancel()
+
+    def iter_stats(self, regions=[]):
+        '''
+        Retrieve data about services as soon as each of them is received
+
+        Every (region, service) listing is an independent task, and all of them run in parallel
+        (no more than `max_workers` at the same time), so the region of the services is never changed.
+
+        Args:
+            regions (lst): Regions where to retrieve data
+
+        Yields:
+            tuple: Region name (None for global services), key (i.e.: Instances) and list of elements
+        '''
+        def get_loadbalancers(regions):
+            # Classic, application and network load balancers (as get_summary and iter_cost_saving)
+            return self.aws.elb.get_loadbalancers(regions=regions) + self.aws.elb.get_loadbalancers_v2(regions=regions)
+
+        listings = [
+            ('Instances', self.aws.ec2.get_instances),
+            ('SecurityGroups', self.aws.ec2.get_secgroups),
+            ('Volumes', self.aws.ec2.get_volumes),
+            # ('Snapshots', self.aws.ec2.get_snapshots),  # Need to select only private snaps
+            ('Addresses', self.aws.ec2.get_addresses),
+            ('Vpcs', self.aws.ec2.get_vpcs),
+            ('LoadBalancers', get_loadbalancers),
+            ('Databases', self.aws.rds.get_databases),
+            ('Certificates', self.aws.acm.list_certificates),
+        ]
+        tasks = [(None, 'Users', self.aws.iam.get_users), (None, 'Buckets', self.aws.s3.get_buckets)]
+        for region in self.aws.ec2.parse_regions(regions):
+            for key, method in listings:
+                tasks.append((region['RegionName'], key, partial(method, regions=[region['RegionName']])))
+        return self._run_tasks(tasks)
+
     def get_stats(self, regions=[]):
         '''
         Retrieve data about services in your AWS account like Volumes, Instances or Databases.
 
+        All the listings of all the regions run in parallel (see `iter_stats`).
+        LoadBalancers include the classic ones and the ELBv2 ones (application and network).
+
         Args:
-            aws: AwsManager client
-            region: To retrieve data only of this region
+            regions (lst): To retrieve data only of these regions
 
         Return:
             List of regions with its stats
         '''
-        results = dict()
-        regions = self.aws.ec2.parse_regions(regions)
-
-        results['Users'] = self.aws.iam.get_users()
-        results['Buckets'] = self.aws.s3.get_buckets()
-        results['Regions'] = dict()
-        for region in regions:
-            self.aws.ec2.change_region(region['RegionName'])
-            data = dict()
-            data['Instances'] = self.aws.ec2.get_instances()
-            data['SecurityGroups'] = self.aws.ec2.get_secgroups()
-            data['Volumes'] = self.aws.ec2.get_volumes()
-            # data['Snapshots'] = self.aws.ec2.get_snapshots();  # Need to select only private snaps
-            data['Addresses'] = self.aws.ec2.get_addresses()
-            data['Vpcs'] = self.aws.ec2.get_vpcs()
-            data['LoadBalancers'] = self.aws.elb.get_loadbalancers()
-            data['Databases'] = self.aws.rds.get_databases()
-            data['Certificates'] = self.aws.acm.list_certificates()
-            results['Regions'][region['RegionName']] = data
+        results = {'Regions': dict((region['RegionName'], dict()) for region in self.aws.ec2.parse_regions(regions))}
+        for region, key, elements in self.iter_stats(regions):
+            (results['Regions'][region] if region else results)[key] = elements
         return results
 
-    def cost_saving(self, regions=[]):
+    # SUMMARIES: Operations (service, operation, elements of a page) and counters (name, group, value) of
+    # each listing of get_summary. Counters without group are totals; counters without value count elements.
+    summaries = {
+        'Users': ([('iam', 'list_users', lambda page: page['Users'])],
+                  [('Count', None, None)]),
+        'Buckets': ([('s3', 'list_buckets', lambda page: page['Buckets'])],
+                    [('Count', None, None)]),
+        'Instances': ([('ec2', 'describe_instances', lambda page: [instance for reservation in page['Reservations']
+                                                                   for instance in reservation['Instances']])],
+                      [('Count', None, None),
+                       ('ByState', lambda x: x['State']['Name'], None),
+                       ('ByType', lambda x: x['InstanceType'], None)]),
+        'SecurityGroups': ([('ec2', 'describe_security_groups', lambda page: page['SecurityGroups'])],
+                           [('Count', None, None)]),
+        'Volumes': ([('ec2', 'describe_volumes', lambda page: page['Volumes'])],
+                    [('Count', None, None),
+                     ('ByState', lambda x: x['State'], None),
+                     ('ByType', lambda x: x['VolumeType'], None),
+                     ('Size', None, lambda x: x['Size']),
+                     ('SizeByType', lambda x: x['VolumeType'], lambda x: x['Size'])]),
+        'Addresses': ([('ec2', 'describe_addresses', lambda page: page['Addresses'])],
+                      [('Count', None, None),
+                       ('Unassociated', None, lambda x: 0 if x.get('AssociationId') else 1)]),
+        'Vpcs': ([('ec2', 'describe_vpcs', lambda page: page['Vpcs'])],
+                 [('Count', None, None)]),
+        'LoadBalancers': ([('elb', 'describe_load_balancers', lambda page: page['LoadBalancerDescriptions']),
+                           ('elbv2', 'describe_load_balancers', lambda page: page['LoadBalancers'])],
+                          [('Count', None, None),
+                           ('ByType', lambda x: x.get('Type', 'classic'), None)]),
+        'Databases': ([('rds', 'describe_db_instances', lambda page: page['DBInstances'])],
+                      [('Count', None, None),
+                       ('ByEngine', lambda x: x['Engine'], None),
+                       ('ByClass', lambda x: x['DBInstanceClass'], None)]),
+        'Certificates': ([('acm', 'list_certificates', lambda page: page['CertificateSummaryList'])],
+                         [('Count', None, None)]),
+    }
+
+    def _summarize(self, key, regions, profiles):
+        operations, counters = self.summaries[key]
+
+        def worker(context):
+            summary = dict((name, 0 if group is None else dict()) for name, group, _ in counters)
+            for service, operation, elements in operations:
+                # Each page is added to the counters and dropped before the next one is requested
+                for page in context._replace(service=service).paginate(operation):
+                    for element in elements(page):
+                        for name, group, value in counters:
+                            amount = value(element) if value else 1
+                            if group is None:
+                                summary[name] += amount
+                            else:
+                                bucket = group(element)
+                                summary[name][bucket] = summary[name].get(bucket, 0) + amount
+
+            account = context.profile or context.access_key or 'default'
+            return [(account, context.region if regions else None, key, summary)]
+
+        return self.aws.ec2.fanout(worker, regions=regions, profiles=profiles)
+
+    def iter_summary(self, regions=[], profiles=[]):
         '''
-        List unused elements that carry expenses.
+        Count the elements of each account and region as soon as each listing is received
+
+        Like `iter_stats`, every (region, service) listing is an independent task, but the elements are
+        never stored: Each page is added to the counters (see `summaries`) and dropped.
 
         Args:
-            aws: AwsManager client.
+            regions (lst): Regions where to count elements
+            profiles (lst): Profiles (accounts) where to count elements
 
-        Returns:
-            Dict Region with a list of regions with its unused elements
+        Yields:
+            tuple: Account, region name (None for global services), key (i.e.: Instances) and counters
+        '''
+        tasks = [(None, key, partial(self._summarize, key, [], profiles)) for key in ['Users', 'Buckets']]
+        for region in self.aws.ec2.parse_regions(regions):
+            for key in self.summaries:
+                if key not in ['Users', 'Buckets']:
+                    tasks.append((region['RegionName'], key,
+                                  partial(self._summarize, key, [region['RegionName']], profiles)))
+
+        for _, _, summaries in self._run_tasks(tasks):
+            for summary in summaries:
+                yield summary
+
+    def get_summary(self, regions=[], profiles=[]):
+        '''
+        Retrieve counters of the services of your AWS accounts, instead of the elements (see `get_stats`)
+
+        Memory doesn't grow with the number of elements: Only the counters of each account and region
+        are kept (i.e.: instances by state and type, or GiB of volumes by type).
+
+        Args:
+            regions (lst): Regions where to count elements
+            profiles (lst): Profiles (accounts) where to count elements
+
+        Examples:
+            summary = aws.stats.get_summary(regions=['eu-west-1'], profiles='ALL')
+            print summary['Accounts']['qa']['Regions']['eu-west-1']['Volumes']['SizeByType']
+
+        Return:
+            dict: Counters of each account (Users, Buckets and Regions with the counters of each region)
         '''
         results = dict()
-        regions = self.aws.ec2.parse_regions(regions)
+        for account, region, key, counters in self.iter_summary(regions, profiles):
+            account = results.setdefault(account, {'Regions': dict()})
+            (account['Regions'].setdefault(region, dict()) if region else account)[key] = counters
+        return {'Accounts': results}
+
+    # PRICES: Estimated monthly cost (USD, us-east-1 on-demand) used to weight the unused elements.
+    # Volumes: GiB-month of each type and provisioned IOPS-month (gp3 includes 3000 IOPS).
+    prices = {
+        'Volumes': {'standard': 0.05, 'gp2': 0.10, 'gp3': 0.08, 'io1': 0.125, 'io2': 0.125, 'st1': 0.045, 'sc1': 0.015},
+        'VolumesIops': {'io1': 0.065, 'io2': 0.065, 'gp3': 0.005},
+        'Addresses': 3.65,
+        'LoadBalancers': {'classic': 18.25, 'application': 16.43, 'network': 16.43, 'gateway': 9.13},
+    }
+
+    def get_monthly_cost(self, kind, element):
+        '''
+        Estimate the monthly cost of an element using the price table (see `prices`)
+
+        Args:
+            kind (str): Kind of element (Volumes, Addresses or LoadBalancers)
+            element (dict): Element returned by the services
+
+        Returns:
+            float: Estimated monthly cost in USD (0 if its type is not in the price table)
+        '''
+        if kind == 'Volumes':
+            volume_type = element.get('VolumeType')
+            iops = element.get('Iops') or 0
+            if volume_type == 'gp3':
+                iops = max(0, iops - 3000)
+            return element.get('Size', 0) * self.prices['Volumes'].get(volume_type, 0) + \
+                   iops * self.prices['VolumesIops'].get(volume_type, 0)
+        if kind == 'Addresses':
+            return self.prices['Addresses']
+        if kind == 'LoadBalancers':
+            return self.prices['LoadBalancers'].get(element.get('Type', 'classic'), 0)
+        return 0
+
+    def iter_cost_saving(self, regions=[], profiles=[]):
+        '''
+        Find unused elements that carry expenses as soon as they are received
+
+        Every (region, kind) search is an independent task, and all of them run in parallel (see `iter_stats`).
+        Volumes (status available) and addresses (domain vpc) are filtered by AWS. Addresses without
+        association and load balancers without instances or registered targets are filtered here.
+
+        Args:
+            regions (lst): Regions where to look for unused elements
+            profiles (lst): Profiles (accounts) where to look for unused elements
+
+        Examples:
+            findings = sorted(aws.stats.iter_cost_saving(profiles='ALL'), key=lambda x: -x['MonthlyCost'])
+
+        Yields:
+            dict: ResourceType (Volumes, Addresses or LoadBalancers), Resource and estimated MonthlyCost
+        '''
+        def unused_loadbalancers(region):
+            elbs = self.aws.elb.iter_loadbalancers(regions=region, profiles=profiles)
+            return [elb for elb in elbs if elb.get('Instances') == []]
 
-        for region in regions:
-            self.aws.ec2.change_region(region['RegionName'])
+        def unused_loadbalancers_v2(region):
+            # Application & Network load balancers without targets registered in any target group
+            elbs = self.aws.elb.iter_loadbalancers_v2(regions=region, profiles=profiles, target_health=True)
+            return [elb for elb in elbs if not any(group['TargetHealthDescriptions'] for group in elb['TargetGroups'])]
 
-            savings = dict()
-            savings['Volumes'] = self.aws.ec2.get_volumes_by({'status': 'available'})
-            adds = self.aws.ec2.get_addresses()
-            savings['Addresses'] = filter(lambda x: x.get('AssociationId') == None, adds)
-            elbs = self.aws.elb.get_loadbalancers()
-            savings['LoadBalancers'] = filter(lambda x: x.get('Instances') == [], elbs)
+        def unused_addresses(region):
+            addresses = self.aws.ec2.iter_addresses_by({'domain': 'vpc'}, regions=region, profiles=profiles)
+            return [address for address in addresses if not address.get('AssociationId')]
+
+        searches = [
+            ('Volumes', lambda region: self.aws.ec2.get_volumes_by({'status': 'available'}, regions=region,
+                                                                    profiles=profiles)),
+            ('Addresses', unused_addresses),
+            ('LoadBalancers', unused_loadbalancers),
+            ('LoadBalancers', unused_loadbalancers_v2),
+        ]
+        tasks = list()
+        for region in self.aws.ec2.parse_regions(regions):
+            for kind, search in searches:
+                tasks.append((region['RegionName'], kind, partial(search, [region['RegionName']])))
+
+        for _, kind, elements in self._run_tasks(tasks):
+            for element in elements:
+                yield {'ResourceType': kind,
+                       'Resource': element,
+                       'MonthlyCost': round(self.get_monthly_cost(kind, element), 2)}
+
+    def cost_saving(self, regions=[], profiles=[]):
+        '''
+        List unused elements that carry expenses.
+
+        All the regions and accounts are searched in parallel (see `iter_cost_saving`).
+
+        Args:
+            regions (lst): Regions where to look for unused elements
+            profiles (lst): Profiles (accounts) where to look for unused elements
+
+        Returns:
+            Dict Region with a list of regions with its unused elements, and the estimated MonthlyCost of each region
+        '''
+        results, costs = dict(), dict()
+        for region in self.aws.ec2.parse_regions(regions):
+            results[region['RegionName']] = {'Volumes': [], 'Addresses': [], 'LoadBalancers': []}
+            costs[region['RegionName']] = 0
 
-            results[region['RegionName']] = savings
-        return {'Regions': results}
+        for finding in self.iter_cost_saving(regions, profiles):
+            region = finding['Resource']['Region']['RegionName']
+            results[region][finding['ResourceType']].append(finding['Resource'])
+            costs[region] += finding['MonthlyCost']
+        return {'Regions': results, 'MonthlyCost': costs}
 
     def __init__(self, aws):
         self.aws = aws
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from threading import Lock
+import cPickle
+
+
+class RecordContext(object):
+    '''
+    Region and authorization shared by all the records found with the same client configuration
+
+    Contexts are interned (see `get`): There is only one object for each (region, profile, access key),
+    so records only keep a reference to it instead of their own copy of the region and authorization.
+
+    Attributes:
+        Region (dict): Region of the records (RegionName, Description and Country)
+        Authorization (dict): Type (Profile/AccessKeys) and Value used to find the records
+    '''
+    __slots__ = ('Region', 'Authorization')
+
+    contexts = dict()
+    contexts_lock = Lock()
+
+    def __init__(self, region, authorization):
+        self.Region = region
+        self.Authorization = authorization
+
+    @classmethod
+    def get(cls, region, profile=None, access_key=None):
+        '''
+        Get the (interned) context of a client configuration
+
+        Args:
+            region (dict): Region with its RegionName
+            profile (str): Profile used by the client
+            access_key (str): Access key used by the client
+
+        Returns:
+            RecordContext
+        '''
+        key = (region['RegionName'], profile, access_key)
+        with cls.contexts_lock:
+            if key not in cls.contexts:
+                if profile:
+                    authorization = {'Type': 'Profile', 'Value': profile}
+                elif access_key:
+                    authorization = {'Type': 'AccessKeys', 'Value': access_key}
+                else:
+                    authorization = {'Type': 'Profile', 'Value': 'default'}
+                cls.contexts[key] = cls(dict(region), authorization)
+            return cls.contexts[key]
+
+
+class Record(object):
+    '''
+    Compact result of a query, used instead of the dicts returned by Boto3 when `AwsBase.records` is enabled
+
+    The payload returned by AWS is kept serialized (pickle) and it is only loaded (once) when one of its keys
+    is accessed. The region and the authorization are not copied, they are taken from the shared context.
+    Records can be used like the dicts (``record['InstanceId']``, ``record.get('Tags')``) or like objects
+    (``record.InstanceId``).
+
+    Examples:
+        AwsBase.records = True
+        instances = aws.service.ec2.get_instances()
+        print instances[0]['InstanceId'], instances[0].Region['RegionName']
+
+    Attributes:
+        context (RecordContext): Shared region and authorization of the record
+        TagName (str): Value of the "Name" tag
+    '''
+    __slots__ = ('_payload', '_data', 'context', 'TagName')
+
+    def __init__(self, element, context):
+        tagname = next((tag.get('Value', '') for tag in element.get('Tags') or [] if tag['Key'] == 'Name'), '')
+        self._payload = cPickle.dumps(element, cPickle.HIGHEST_PROTOCOL)
+        self._data = None
+        self.context = context
+        self.TagName = tagname
+
+    @property
+    def data(self):
+        '''Payload returned by AWS (loaded on first access and shared by the next ones, don't modify it)'''
+        if self._data is None:
+            self._data = cPickle.loads(self._payload)
+        return self._data
+
+    def to_dict(self):
+        '''Get the record as the dict which is returned when records are disabled'''
+        return dict(self.data, TagName=self.TagName, Region=self.context.Region,
+                    Authorization=self.context.Authorization)
+
+    def __getitem__(self, key):
+        if key in ('Region', 'Authorization'):
+            return getattr(self.context, key)
+        if key == 'TagName':
+            return self.TagName
+        return self.data[key]
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __contains__(self, key):
+        return key in ('Region', 'Authorization', 'TagName') or key in self.data
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.data.keys() + ['TagName', 'Region', 'Authorization']
+
+    def __getstate__(self):
+        return (self._payload, self.context.Region, self.context.Authorization, self.TagName)
+
+    def __setstate__(self, state):
+        self._payload, region, authorization, self.TagName = state
+        self._data = None
+        if authorization['Type'] == 'AccessKeys':
+            self.context = RecordContext.get(region, access_key=authorization['Value'])
+        else:
+            self.context = RecordContext.get(region, profile=authorization['Value'])
+
+    def __repr__(self):
+        return 'Record(%r)' % self.to_dict()
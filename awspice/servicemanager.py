@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from services import *
+import services
+from services.base import AwsBase
 
 class ServiceManager:
     '''
@@ -8,6 +9,7 @@ class ServiceManager:
     For each service (ec2, s3, vpc ...) you are given access through a property of this class.
     This property will return an instance of the corresponding class, for example Ec2Service or VpcService.
     Each class of service (Ec2Service, S3Service ...) inherits from the AwsBase class.
+    Services are imported and created the first time that their property is used.
     '''
 
     _ec2 = None
@@ -20,40 +22,44 @@ class ServiceManager:
 
     @property
     def ec2(self):
-        if self._ec2 is None: self._ec2 = Ec2Service()
+        if self._ec2 is None: self._ec2 = services.Ec2Service()
         return self._ec2
 
     @property
     def elb(self):
-        if self._elb is None: self._elb = ElbService()
+        if self._elb is None: self._elb = services.ElbService()
         return self._elb
 
     @property
     def acm(self):
-        if self._acm is None: self._acm = AcmService()
+        if self._acm is None: self._acm = services.AcmService()
         return self._acm
 
     @property
     def iam(self):
-        if self._iam is None: self._iam = IamService()
+        if self._iam is None: self._iam = services.IamService()
         return self._iam
 
     @property
     def rds(self):
-        if self._rds is None: self._rds = RdsService()
+        if self._rds is None: self._rds = services.RdsService()
         return self._rds
 
     @property
     def s3(self):
-        if self._s3 is None: self._s3 = S3Service()
+        if self._s3 is None: self._s3 = services.S3Service()
         return self._s3
 
     @property
     def ce(self):
-        if self._ce is None: self._ce = CostExplorerService()
+        if self._ce is None: self._ce = services.CostExplorerService()
         return self._ce
 
 
+    @property
+    def cache(self):
+        return AwsBase.cache
+
     @classmethod
     def get_auth_config(cls):
         '''
@@ -75,7 +81,7 @@ class ServiceManager:
         return auth
 
 
-    def __init__(self, region, profile=None, access_key=None, secret_key=None):
+    def __init__(self, region, profile=None, access_key=None, secret_key=None, cache=False, records=False):
         '''
         Constructor of the parent class of the services.
 
@@ -87,8 +93,20 @@ class ServiceManager:
             profile (str): Name of the AWS profile set in ~/.aws/credentials file
             access_key (str): API access key of your AWS account
             secret_key (str): API secret key of your AWS account
+            cache (bool | str | InventoryCache): Store the results of the queries in a cache.
+                True to use the default file (~/.awspice/cache.sqlite), the path of a file or an InventoryCache.
+            records (bool): Return compact records (awspice.records.Record) instead of dicts
         '''
         AwsBase.region = region
         AwsBase.access_key = access_key
         AwsBase.secret_key = secret_key
         AwsBase.profile = profile
+        AwsBase.records = records
+        if cache:
+            from cache import InventoryCache
+            if isinstance(cache, InventoryCache):
+                AwsBase.cache = cache
+            elif isinstance(cache, basestring):
+                AwsBase.cache = InventoryCache(cache)
+            else:
+                AwsBase.cache = InventoryCache()
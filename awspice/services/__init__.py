@@ -1,10 +1,34 @@
-from acm import AcmService
-from base import AwsBase
-from ce import CostExplorerService
-from ec2 import Ec2Service
-from elb import ElbService
-from iam import IamService
-from rds import RdsService
-from s3 import S3Service
+import sys
+from types import ModuleType
+
+# Module of each service class. Classes are imported on first use (i.e.: awspice.services.Ec2Service),
+# so importing awspice doesn't load the services (and their dependencies) which are never used.
+_services = {
+    'AwsBase': 'base',
+    'AcmService': 'acm',
+    'CostExplorerService': 'ce',
+    'Ec2Service': 'ec2',
+    'ElbService': 'elb',
+    'IamService': 'iam',
+    'RdsService': 'rds',
+    'S3Service': 's3',
+}
 
 __all__ = ['AwsBase', 'Ec2Service', 'ElbService', 'IamService', 'RdsService', 'S3Service', 'AcmService', 'CostExplorerService']
+
+
+class _LazyModule(ModuleType):
+
+    def __getattr__(self, name):
+        if name not in _services:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        module = __import__('%s.%s' % (__name__, _services[name]), fromlist=[name])
+        setattr(self, name, getattr(module, name))
+        return getattr(self, name)
+
+
+_module = _LazyModule(__name__, __doc__)
+_module.__dict__.update(globals())
+# Keep a reference to the original module, otherwise Python 2 clears its globals when it is collected
+_module._original = sys.modules[__name__]
+sys.modules[__name__] = _module
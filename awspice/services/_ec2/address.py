@@ -7,47 +7,68 @@ address_filters = {
 }
 
 
-def _extract_addresses(self, filters=[], regions=[], return_first=False):
-    results = list()
+def _extract_addresses(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
 
-    regions = self.parse_regions(regions)
-    for region in regions:
-        self.change_region(region['RegionName'])
+    def worker(context):
+        for page in context.paginate('describe_addresses', Filters=filters):
+            yield self.inject_client_vars(page['Addresses'], context.client_vars)
 
-        addresses = self.client.describe_addresses(Filters=filters)['Addresses']
-        addresses = self.inject_client_vars(addresses)
+    return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
 
-        if return_first and addresses:
-            return addresses[0]
-
-        results.extend(addresses)
-
-    return results
-
-def get_addresses(self, regions=[]):
+def get_addresses(self, regions=[], profiles=[]):
     '''
     Get all IP Addresses for a region
 
     Args:
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Addresses (dict): List of dictionaries with the addresses requested
     '''
-    return self._extract_addresses(regions=regions)
+    return self._extract_addresses(regions=regions, profiles=profiles)
+
+def iter_addresses(self, regions=[], profiles=[]):
+    '''
+    Iterate over all IP Addresses for one or more regions as they are received
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        Address (dict): Dictionary with each address
+    '''
+    return self._extract_addresses(regions=regions, profiles=profiles, stream=True)
+
+def iter_addresses_by(self, filters, regions=[], profiles=[]):
+    '''
+    Iterate over the IP Addresses for one or more regions that match with filters as they are received
+
+    Args:
+        filters (dict): Filters to apply (i.e.: {'domain': 'vpc'})
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        Address (dict): Dictionary with each address
+    '''
+    formatted_filters = self.validate_filters(filters, self.address_filters)
+    return self._extract_addresses(filters=formatted_filters, regions=regions, profiles=profiles, stream=True)
 
-def get_addresses_by(self, filters, regions=[]):
+def get_addresses_by(self, filters, regions=[], profiles=[]):
     '''
     Get all IP Addresses for a region
 
     Args:
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Addresses (dict): List of dictionaries with the addresses requested
     '''
     formatted_filters = self.validate_filters(filters, self.address_filters)
-    return self._extract_addresses(filters=formatted_filters, regions=regions)
+    return self._extract_addresses(filters=formatted_filters, regions=regions, profiles=profiles)
 
 def get_address_by(self, filters, regions=[]):
     '''
@@ -21,7 +21,9 @@ distrib_amis = {
 }
 
 
-def _extract_amis(self, filters=[], regions=[], return_first=False):
+def _extract_amis(self, filters=[], regions=[], return_first=False, stream=False):
+    # [!] Copy the filters to avoid to modify the default argument
+    filters = list(filters)
     filters.append({'Name': 'state', 'Values': ['available', 'pending']})
     # Just supported x64 OS
     filters.append({'Name': 'architecture', 'Values': ['x86_64']})
@@ -30,22 +32,11 @@ def _extract_amis(self, filters=[], regions=[], return_first=False):
     filters.append({'Name': 'image-type', 'Values': ['machine']})
     filters.append({'Name': 'root-device-type', 'Values': ['ebs']})
 
-    curRegion = self.region
-    regions = self.parse_regions(regions)
-    results = list()
+    def worker(context):
+        for page in context.paginate('describe_images', Filters=filters):
+            yield self.inject_client_vars(page['Images'], context.client_vars)
 
-    for region in regions:
-        self.change_region(region['RegionName'])
-
-        amis = self.client.describe_images(Filters=filters)['Images']
-        amis = self.inject_client_vars(amis)
-        if return_first and amis:
-            self.change_region(curRegion)
-            return amis[0]
-        results.extend(amis)
-
-    self.change_region(curRegion)
-    return results
+    return self.fanout(worker, regions=regions, return_first=return_first, stream=stream)
 
 def get_amis_by_distribution(self, distrib, version='*', latest=False, regions=[]):
     '''
@@ -116,4 +107,16 @@ def get_amis(self, regions=[]):
     Returns:
         Images (lst): List of all images
     '''
-    return self._extract_amis(regions=regions)
\ No newline at end of file
+    return self._extract_amis(regions=regions)
+
+def iter_amis(self, regions=[]):
+    '''
+    Iterate over all images as they are received
+
+    Args:
+        regions (lst): Regions where to look for this element
+
+    Yields:
+        Image (dict): Dictionary with each image
+    '''
+    return self._extract_amis(regions=regions, stream=True)
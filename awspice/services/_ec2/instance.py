@@ -1,4 +1,3 @@
-from threading import Lock
 from awspice.helpers import extract_region_from_ip
 
 instance_filters = {
@@ -19,49 +18,57 @@ instance_status_filters = {
 }
 
 
-def _extract_instances(self, filters=[], regions=[], return_first=False):
-    regions = self.parse_regions(regions)
-    results = dict() if return_first else list()
-    lock = Lock()
-
-    def worker(region):
-        # Race Condition: Locking AwsBase.region...
-        # Change region > Get client config > Do the query
-        lock.acquire()
-        self.change_region(region['RegionName'])
-        config = self.get_client_vars()
-        lock.release()
-
-        reservations = self.client.describe_instances(Filters=filters)["Reservations"]
-        for reserv in reservations:
-            instances = self.inject_client_vars(reserv['Instances'], config)
+def _extract_instances(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
 
-            if return_first and instances:
-                results.update(instances[0])
-            if not return_first and instances:
-                results.extend(instances)
+    def worker(context):
+        for page in context.paginate('describe_instances', Filters=filters):
+            for reserv in page["Reservations"]:
+                yield self.inject_client_vars(reserv['Instances'], context.client_vars)
 
-    # Launch tasks in threads
-    for region in regions: self.pool.add_task(worker, region=region)
+    return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
 
-    # Wait results
-    self.pool.wait_completion()
-    
-    return results
-
-def get_instances(self, regions=[]):
+def get_instances(self, regions=[], profiles=[]):
     '''
     Get all instances for one or more regions.
 
     Args:
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Instances (lst): List of dictionaries with the instances requested
     '''
-    return self._extract_instances(regions=regions)
+    return self._extract_instances(regions=regions, profiles=profiles)
+
+def iter_instances(self, regions=[], profiles=[]):
+    '''
+    Iterate over all instances for one or more regions as they are received (page by page).
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
-def get_instance_by(self, filters, regions=[]):
+    Yields:
+        Instance (dict): Dictionary with each instance
+    '''
+    return self._extract_instances(regions=regions, profiles=profiles, stream=True)
+
+def iter_instances_by(self, filters, regions=[], profiles=[]):
+    '''
+    Iterate over the instances for one or more regions that match with filter as they are received.
+
+    Args:
+        filters (dict): Filters to apply (i.e.: {'status': 'running'})
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        Instance (dict): Dictionary with each instance
+    '''
+    formatted_filters = self.validate_filters(filters, self.instance_filters)
+    return self._extract_instances(filters=formatted_filters, regions=regions, profiles=profiles, stream=True)
+
+def get_instance_by(self, filters, regions=[], profiles=[]):
     '''
     Get an instance for one or more regions that matches with filter
 
@@ -69,13 +76,14 @@ def get_instance_by(self, filters, regions=[]):
         filter_key (str): Name of the filter
         filter_value (str): Value of the filter
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Return:
         Instance (dict): Dictionary with the instance requested
     '''
-    return self.get_instances_by(filters, regions, return_first=True)
+    return self.get_instances_by(filters, regions, return_first=True, profiles=profiles)
 
-def get_instances_by(self, filters, regions=[], return_first=False):
+def get_instances_by(self, filters, regions=[], return_first=False, profiles=[]):
     '''
     Get an instance for one or more regions that matches with filter
 
@@ -84,6 +92,7 @@ def get_instances_by(self, filters, regions=[], return_first=False):
         filter_value (str): Value of the filter
         regions (lst): Regions where to look for this element
         return_first (bool): Select to return the first match
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Return:
         Instances (lst): List of dictionaries with the instances requested
@@ -94,20 +103,15 @@ def get_instances_by(self, filters, regions=[], return_first=False):
         ip_in_aws, ip_region = extract_region_from_ip(filters['publicip'])
         
         if not ip_in_aws:
-            return {}
+            return {} if return_first else []
 
-        # ['eu-west-1', 'eu-west-2']    / 'eu-west-1'
-        # [ {'RegionName': 'eu-west-1'}, {...} ]
-        if isinstance(regions, list):
-            if ip_region in regions or ip_region in regions[0].values():
-                region = ip_region
-                
-        # {'eu-west-1': {...}, 'eu-west-2': {...} }
-        if isinstance(regions, dict):
-            if ip_region in regions.keys():
-                region = ip_region
+        # Search only in the region of the IP (if it's one of the requested regions)
+        if ip_region:
+            if ip_region not in [region['RegionName'] for region in self.parse_regions(regions)]:
+                return {} if return_first else []
+            regions = [ip_region]
 
-    return self._extract_instances(filters=formatted_filters, regions=regions, return_first=return_first)
+    return self._extract_instances(filters=formatted_filters, regions=regions, return_first=return_first, profiles=profiles)
 
 def create_instances(self, name, key_name, allowed_range, ami=None, distribution=None,
                         version=None, instance_type='t2.micro', region=None, vpc=None, count=1):
@@ -241,34 +245,20 @@ def stop_instances(self, instance_ids, regions=[], force=False):
 
 # ######################## INSTANCE STATUS ########################
 
-def _extract_instance_status(self, filters=[], regions=[], return_first=False):
-    regions = self.parse_regions(regions)
-    results = dict() if return_first else list()
-    lock = Lock()
-
-    def worker(region):
-        lock.acquire()
-        self.change_region(region['RegionName'])
-        config = self.get_client_vars()
-        lock.release()
+def _extract_instance_status(self, filters=[], regions=[], return_first=False, stream=False):
 
-        instances = self.client.describe_instance_status(Filters=filters)["InstanceStatuses"]
-        if instances:
-            instances = self.inject_client_vars(instances, config)
+    def worker(context):
+        for page in context.paginate('describe_instance_status', Filters=filters):
+            yield self.inject_client_vars(page["InstanceStatuses"], context.client_vars)
 
-            if return_first:
-                results.update(instances[0])
-            if not return_first:
-                results.extend(instances)
-
-    for region in regions: self.pool.add_task(worker, region=region)
-    self.pool.wait_completion()
-    
-    return results
+    return self.fanout(worker, regions=regions, return_first=return_first, stream=stream)
 
 def get_instances_status(self, regions=[]):
     return self._extract_instance_status(regions=regions)
 
+def iter_instances_status(self, regions=[]):
+    return self._extract_instance_status(regions=regions, stream=True)
+
 def get_instance_status_by(self, filters, regions=[]):
     formatted_filters = self.validate_filters(filters, self.instance_status_filters)
     return self.get_instances_status_by(filters, regions, return_first=True)
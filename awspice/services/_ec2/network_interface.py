@@ -0,0 +1,77 @@
+
+network_interface_filters = {
+    'id': 'network-interface-id',
+    'publicip': 'association.public-ip',
+    'privateip': 'addresses.private-ip-address',
+    'instance': 'attachment.instance-id',
+    'type': 'interface-type',
+    'vpc': 'vpc-id',
+    'subnet': 'subnet-id',
+    'status': 'status',
+}
+
+
+def _extract_network_interfaces(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
+
+    def worker(context):
+        for page in context.paginate('describe_network_interfaces', Filters=filters):
+            yield self.inject_client_vars(page['NetworkInterfaces'], context.client_vars)
+
+    return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
+
+def get_network_interfaces(self, regions=[], profiles=[]):
+    '''
+    Get all network interfaces (ENIs) for one or more regions
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Returns:
+        NetworkInterfaces (lst): List of dictionaries with the network interfaces requested
+    '''
+    return self._extract_network_interfaces(regions=regions, profiles=profiles)
+
+def iter_network_interfaces(self, regions=[], profiles=[]):
+    '''
+    Iterate over all network interfaces (ENIs) for one or more regions as they are received
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        NetworkInterface (dict): Dictionary with each network interface
+    '''
+    return self._extract_network_interfaces(regions=regions, profiles=profiles, stream=True)
+
+def get_network_interface_by(self, filters, regions=[], profiles=[]):
+    '''
+    Get a network interface (ENI) for one or more regions that matches with filters
+
+    Args:
+        filters (dict): Filters to apply. Allowed filters in `network_interface_filters`
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Returns:
+        NetworkInterface (dict): Dictionary with the network interface requested
+    '''
+    formatted_filters = self.validate_filters(filters, self.network_interface_filters)
+    return self._extract_network_interfaces(filters=formatted_filters, regions=regions, profiles=profiles,
+                                            return_first=True)
+
+def get_network_interfaces_by(self, filters, regions=[], profiles=[]):
+    '''
+    Get network interfaces (ENIs) for one or more regions that match with filters
+
+    Args:
+        filters (dict): Filters to apply. Allowed filters in `network_interface_filters`
+        regions (lst): Regions where to look for these elements
+        profiles (lst): Profiles (accounts) where to look for these elements
+
+    Returns:
+        NetworkInterfaces (lst): List of dictionaries with the network interfaces requested
+    '''
+    formatted_filters = self.validate_filters(filters, self.network_interface_filters)
+    return self._extract_network_interfaces(filters=formatted_filters, regions=regions, profiles=profiles)
@@ -1,5 +1,3 @@
-from threading import Lock
-
 secgroup_filters = {
     'id': 'group-id',
     'name': 'group-name',
@@ -8,42 +6,57 @@ secgroup_filters = {
     'fromport': 'ip-permission.from-port',
     'toport': 'ip-permission.to-port',
     'range': 'ip-permission.cidr',
+    'vpc': 'vpc-id',
 }
 
-def _extract_secgroups(self, filters=[], regions=[], return_first=False):
-    regions = self.parse_regions(regions)
-    results = dict() if return_first else list()
-    lock = Lock()
-
-    def worker(region):
-        lock.acquire()
-        self.change_region(region['RegionName'])
-        config = self.get_client_vars()
-        lock.release()
-
-        secgroups = self.client.describe_security_groups(Filters=filters)["SecurityGroups"]
+def _extract_secgroups(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
 
-        if secgroups:
-            secgroups = self.inject_client_vars(secgroups, config)
+    def worker(context):
+        for page in context.paginate('describe_security_groups', Filters=filters):
+            yield self.inject_client_vars(page["SecurityGroups"], context.client_vars)
 
-            if return_first:
-                results.update(secgroups[0])
-            if not return_first:
-                results.extend(secgroups)
+    return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
 
-    for region in regions: self.pool.add_task(worker, region=region)
-    self.pool.wait_completion()
-    
-    return results
-
-def get_secgroups(self, regions=[]):
+def get_secgroups(self, regions=[], profiles=[]):
     '''
     Get all security groups for the current region
 
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
     Returns:
         SecurityGroups (lst): List of dictionaries with the security groups requested
     '''
-    return self._extract_secgroups(regions=regions)
+    return self._extract_secgroups(regions=regions, profiles=profiles)
+
+def iter_secgroups(self, regions=[], profiles=[]):
+    '''
+    Iterate over all security groups for one or more regions as they are received (page by page).
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        SecurityGroup (dict): Dictionary with each security group
+    '''
+    return self._extract_secgroups(regions=regions, profiles=profiles, stream=True)
+
+def iter_secgroups_by(self, filters, regions=[], profiles=[]):
+    '''
+    Iterate over the security groups that match with filters as they are received (page by page).
+
+    Args:
+        filters (dict): Filters to apply (i.e.: {'name': 'default'})
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        SecurityGroup (dict): Dictionary with each security group
+    '''
+    formatted_filters = self.validate_filters(filters, self.secgroup_filters)
+    return self._extract_secgroups(filters=formatted_filters, regions=regions, profiles=profiles, stream=True)
 
 def get_secgroup_by(self, filters, regions=[]):
     '''
@@ -59,19 +72,20 @@ def get_secgroup_by(self, filters, regions=[]):
     formatted_filters = self.validate_filters(filters, self.secgroup_filters)
     return self._extract_secgroups(filters=formatted_filters, regions=regions, return_first=True)
 
-def get_secgroups_by(self, filters, regions=[]):
+def get_secgroups_by(self, filters, regions=[], profiles=[]):
     '''
     Get all security groups for a region that matches with filters
 
     Args:
-        filter_key (str): Name of the filter
-        filter_value (str): Value of the filter
+        filters (dict): Filters to apply (i.e.: {'id': ['sg-1', 'sg-2']})
+        regions (lst): Regions where to look for these elements
+        profiles (lst): Profiles (accounts) where to look for these elements
 
     Returns:
         SecurityGroups (lst): List of dictionaries with the security groups requested
     '''
     formatted_filters = self.validate_filters(filters, self.secgroup_filters)
-    return self._extract_secgroups(filters=formatted_filters, regions=regions)
+    return self._extract_secgroups(filters=formatted_filters, regions=regions, profiles=profiles)
 
 def create_security_group(self, name, allowed_range, vpc_id=None):
     '''
@@ -1,5 +1,3 @@
-from threading import Lock
-
 volume_filters = {
     'id': 'volume-id',
     'status': 'status',
@@ -10,47 +8,56 @@ volume_filters = {
 }
 
 
-def _extract_volumes(self, filters=[], regions=[], return_first=False):
-    regions = self.parse_regions(regions)
-    results = dict() if return_first else list()
-    lock = Lock()
-    
-    def worker(region):
-        lock.acquire()
-        self.change_region(region['RegionName'])
-        config = self.get_client_vars()
-        lock.release()
-
-        volumes = self.client.describe_volumes(Filters=filters)['Volumes']
-
-        if volumes:
-            volumes = self.inject_client_vars(volumes, config)
-            if return_first:
-                results.update(volumes[0])
-            else:
-                results.extend(volumes)
+def _extract_volumes(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
 
-    # Launch tasks in threads
-    for region in regions: self.pool.add_task(worker, region=region)
+    def worker(context):
+        for page in context.paginate('describe_volumes', Filters=filters):
+            yield self.inject_client_vars(page['Volumes'], context.client_vars)
 
-    # Wait results
-    self.pool.wait_completion()
+    return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
 
-    return results
-
-def get_volumes(self, regions=[]):
+def get_volumes(self, regions=[], profiles=[]):
     '''
     Get all volumes for one or more regions
 
     Args:
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Volumes (lst): List of dictionaries with the volumes requested
     '''
-    return self._extract_volumes(regions=regions)
+    return self._extract_volumes(regions=regions, profiles=profiles)
+
+def iter_volumes(self, regions=[], profiles=[]):
+    '''
+    Iterate over all volumes for one or more regions as they are received (page by page).
+
+    Args:
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        Volume (dict): Dictionary with each volume
+    '''
+    return self._extract_volumes(regions=regions, profiles=profiles, stream=True)
+
+def iter_volumes_by(self, filters, regions=[], profiles=[]):
+    '''
+    Iterate over the volumes for one or more regions that match with filters as they are received.
+
+    Args:
+        filters (dict): Filters to apply (i.e.: {'status': 'available'})
+        regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
+
+    Yields:
+        Volume (dict): Dictionary with each volume
+    '''
+    formatted_filters = self.validate_filters(filters, self.volume_filters)
+    return self._extract_volumes(filters=formatted_filters, regions=regions, profiles=profiles, stream=True)
 
-def get_volume_by(self, filters, regions=[]):
+def get_volume_by(self, filters, regions=[], profiles=[]):
     '''
     Get a volume for one or more regions that matches with filters
 
@@ -58,13 +65,14 @@ def get_volume_by(self, filters, regions=[]):
         filter_key (str): Name of the filter
         filter_value (str): Value of the filter
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Volume (dict): Dictionary with the volume requested
     '''
-    return self.get_volumes_by(filters, regions, return_first=True)
+    return self.get_volumes_by(filters, regions, return_first=True, profiles=profiles)
 
-def get_volumes_by(self, filters, regions=[], return_first=False):
+def get_volumes_by(self, filters, regions=[], return_first=False, profiles=[]):
     '''
     Get volumes for one or more regions that matches with filters
 
@@ -72,10 +80,11 @@ def get_volumes_by(self, filters, regions=[], return_first=False):
         filter_key (str): Name of the filter
         filter_value (str): Value of the filter
         regions (lst): Regions where to look for this element
+        profiles (lst): Profiles (accounts) where to look for this element
 
     Returns:
         Volume (dict): Dictionary with the volume requested
     '''
     formatted_filters = self.validate_filters(filters, self.volume_filters)
-    return self._extract_volumes(filters=formatted_filters, regions=regions, return_first=return_first)
+    return self._extract_volumes(filters=formatted_filters, regions=regions, return_first=return_first, profiles=profiles)
 
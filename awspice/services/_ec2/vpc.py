@@ -1,21 +1,11 @@
 
-def _extract_vpcs(self, filters=[], regions=[], return_first=False):
-    results = list()
+def _extract_vpcs(self, filters=[], regions=[], return_first=False, stream=False):
 
-    regions = self.parse_regions(regions)
-    for region in regions:
-        self.change_region(region['RegionName'])
+    def worker(context):
+        for page in context.paginate('describe_vpcs', Filters=filters):
+            yield self.inject_client_vars(page['Vpcs'], context.client_vars)
 
-        vpcs = self.client.describe_vpcs(Filters=filters)['Vpcs']
-        vpcs = self.inject_client_vars(vpcs)
-
-        if return_first and vpcs:
-            self.change_region(curRegion)
-            return vpcs[0]
-
-        results.extend(vpcs)
-
-    return results
+    return self.fanout(worker, regions=regions, return_first=return_first, stream=stream)
 
 def get_vpcs(self, regions=[]):
     '''
@@ -26,6 +16,15 @@ def get_vpcs(self, regions=[]):
     '''
     return self._extract_vpcs(regions=regions)
 
+def iter_vpcs(self, regions=[]):
+    '''
+    Iterate over all VPCs for one or more regions as they are received
+
+    Yields:
+        VPC (dict): Dictionary with each vpc
+    '''
+    return self._extract_vpcs(regions=regions, stream=True)
+
 def get_default_vpc(self):
     '''
     Get default Security Group
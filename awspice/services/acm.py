@@ -16,14 +16,11 @@ class AcmService(AwsBase):
         Returns:
             List of certificates
         '''
-        certificates = list()
-        regions = self.parse_regions(regions)
-
-        for region in regions:
-            self.change_region(region['RegionName'])
-            certificates.extend(self.inject_client_vars(self.client.list_certificates()['CertificateSummaryList']))
+        def worker(context):
+            for page in context.paginate('list_certificates'):
+                yield self.inject_client_vars(page['CertificateSummaryList'], context.client_vars)
 
-        return certificates
+        return self.fanout(worker, regions=regions)
 
     def get_certificate_by(self, filter_key, filter_value, regions=[]):
         '''
@@ -1,8 +1,88 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
 import json
-import boto3
-from awspice.helpers import ThreadPool
-from pkg_resources import resource_filename
+import random
+import marshal
+from collections import namedtuple, deque, OrderedDict
+from Queue import Queue, Full, Empty
+from time import sleep
+from threading import Event, Lock, current_thread
+from awspice.helpers import Executor, LRUCache
+from awspice.records import Record, RecordContext
+
+
+class ClientContext(namedtuple('ClientContext', ['service', 'region', 'profile', 'access_key', 'secret_key'])):
+    '''
+    Immutable client configuration (service, region and credentials) used by a single task
+
+    AwsBase stores the region and credentials in class attributes which are shared by all services
+    and threads. Tasks that run in parallel receive one of these objects instead, so they never
+    have to change (and lock) the configuration of AwsBase to query their region.
+
+    Attributes:
+        client: Boto3 client for this configuration (taken from the clients cache)
+        resource: Boto3 resource for this configuration (None if the service hasn't resources)
+        client_vars: Client configuration in the format used by `AwsBase.inject_client_vars`
+    '''
+    __slots__ = ()
+
+    @property
+    def client(self):
+        return AwsBase.clients.get(self, lambda: AwsBase._create_client(*self))
+
+    @property
+    def resource(self):
+        # Created on first use: Loading the model of a resource is expensive and few methods use them
+        return AwsBase.clients.get((self, 'resource'), lambda: AwsBase._create_resource(*self))
+
+    @property
+    def client_vars(self):
+        _region = dict(AwsBase.endpoints['Regions'].get(self.region, {}), RegionName=self.region)
+        return {'region': _region, 'profile': self.profile, 'access_key': self.access_key}
+
+    def paginate(self, operation, **kwargs):
+        '''
+        Yield every page of results of an operation
+
+        The paginator of Boto3 is used if the operation supports it. Otherwise, the operation is
+        called once and its response is the only page.
+        If the inventory cache is enabled (`AwsBase.cache`), the pages are read from the cache while
+        they don't expire, and they are stored once all of them have been received.
+
+        Args:
+            operation (str): Name of the client method (i.e.: describe_instances)
+            kwargs: Arguments of the operation (i.e.: Filters)
+
+        Yields:
+            dict: Response of each page
+        '''
+        cache = AwsBase.cache
+        if cache:
+            key = (self.profile or self.access_key or 'default', self.region, '%s.%s' % (self.service, operation), kwargs)
+            pages = cache.get(*key)
+            if pages is not None:
+                for page in pages:
+                    yield page
+                return
+
+        client = self.client
+        if client.can_paginate(operation):
+            responses = client.get_paginator(operation).paginate(**kwargs)
+        else:
+            responses = [getattr(client, operation)(**kwargs)]
+
+        pages = list()
+        for page in responses:
+            if cache:
+                page.pop('ResponseMetadata', None)
+                # Serialized before yielding it, because the elements are updated by the services
+                pages.append(cache.serialize(page))
+            yield page
+
+        if cache:
+            cache.set(*key, pages=pages)
+
 
 class AwsBase(object):
     '''
@@ -14,6 +94,17 @@ class AwsBase(object):
 
     Attributes:
         client: Boto3 client
+        resource: Boto3 resource (created on first use, None if the service hasn't resources)
+        context: Current client configuration (ClientContext)
+        clients: Cache of Boto3 clients and resources already created
+        sessions: Cache of Boto3 sessions of each credentials
+        pool: Executor (pool of threads) of the service
+        pool_size: Number of threads of the executor of the service
+        max_workers: Maximum number of tasks running at the same time in a fan-out (pool_size by default)
+        max_workers_per_account: Maximum number of tasks running at the same time for an account
+        limiter: Rate limiter used by all the clients (see `awspice.helpers.RateLimiter`, None to disable it)
+        cache: Inventory cache used by all the services (see `awspice.cache.InventoryCache`)
+        records: Return compact records (see `awspice.records.Record`) instead of dicts
         region: Current region used by the client
         profile: Current profile used by the client
         access_key: Current access key used by the client
@@ -26,11 +117,53 @@ class AwsBase(object):
     access_key = None
     secret_key = None
 
-    # THREADS NUMBER
-    pool = ThreadPool(30)
+    # THREADS NUMBER: Size of the pool of each service (services can set their own size)
+    pool_size = 30
+    pools = dict()
+    pools_lock = Lock()
+
+    # CONCURRENCY LIMITS: Tasks running at same time (all accounts / same account) in `fanout`
+    max_workers = None
+    max_workers_per_account = None
+
+    # CLIENTS CACHE: Clients & resources shared by every service, keyed by (service, region, credentials)
+    clients = LRUCache(256)
+
+    # SESSIONS: Session of each credentials & botocore loader (models already parsed) shared by all of them
+    sessions = LRUCache(64)
+    sessions_lock = Lock()
+    loader = None
 
     service_resources = ['ec2', 's3']
 
+    # REGIONS TABLE: Partition of botocore's endpoints.json precompiled for each botocore version
+    endpoints_cache = '~/.awspice/endpoints-{botocore}-py{python}.marshal'
+
+    # RECORDS: Return compact Record objects (awspice.records) instead of the dicts of Boto3
+    records = False
+
+    # INVENTORY CACHE: Persistent cache of the results of the queries (None to disable it)
+    cache = None
+
+    # RATE LIMITS: Calls per second to each API (adapted to throttling) & retries of throttled calls.
+    # Disabled by default (Boto3 retries the throttled calls): AwsBase.limiter = RateLimiter()
+    limiter = None
+    max_attempts = 8
+    max_retry_delay = 20
+    throttling_errors = ['Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+                         'TooManyRequestsException', 'RequestLimitExceeded', 'RequestThrottled', 'SlowDown',
+                         'EC2ThrottledException', 'BandwidthLimitExceeded', 'PriorRequestNotComplete']
+
+
+    @property
+    def pool(self):
+        '''
+        Executor shared by all the instances of the service, created on first use with `pool_size` threads
+        '''
+        with AwsBase.pools_lock:
+            if self.service not in AwsBase.pools:
+                AwsBase.pools[self.service] = Executor(self.pool_size)
+            return AwsBase.pools[self.service]
 
     def set_client(self, service):
         '''
@@ -60,28 +193,143 @@ class AwsBase(object):
                              profile=_profile,
                              access_key=_access_key,
                              secret_key=_secret_key)
-        # 2. Set Boto3 client
-        if _profile:
-            self.client = boto3.Session(profile_name=_profile).client(service, region_name=_region)
-            if service in self.service_resources:
-                self.resource = boto3.Session(profile_name=_profile).resource(
-                    service, region_name=_region)
-
-        elif _access_key and _secret_key:
-            self.client = boto3.client(service,
-                                    region_name=_region,
-                                    aws_access_key_id=_access_key,
-                                    aws_secret_access_key=_secret_key)
-            if service in self.service_resources:
-                self.resource = boto3.resource(service,
-                                            region_name=_region,
-                                            aws_access_key_id=_access_key,
-                                            aws_secret_access_key=_secret_key)
-        # If auth isn't provided, set "default" profile (.aws/credentials)
-        else:
-            self.client = boto3.client(service, region_name=_region)
-            if service in self.service_resources:
-                self.resource = boto3.resource(service, region_name=_region)
+        # 2. Set Boto3 client (Reused if it has been created before for same credentials & region)
+        self.context = ClientContext(service, _region, _profile, _access_key, _secret_key)
+        self.client = self.context.client
+
+    @property
+    def resource(self):
+        '''
+        Boto3 resource of the current client configuration (created on first use)
+        '''
+        return self.context.resource
+
+    @classmethod
+    def _get_session(cls, profile=None, access_key=None, secret_key=None):
+        '''
+        Get the Boto3 session of some credentials, created once and shared by all their clients
+
+        All the sessions use the same botocore loader, so the models of each service are parsed only once.
+
+        Args:
+            profile (str): Profile name set in ~/.aws/credentials file
+            access_key (str): API access key of your AWS account
+            secret_key (str): API secret key of your AWS account
+
+        Returns:
+            tuple: Boto3 session and the lock to use it (sessions are not thread-safe)
+        '''
+        def create():
+            import boto3
+            import botocore.session
+            import botocore.loaders
+
+            core = botocore.session.Session()
+            with AwsBase.sessions_lock:
+                if AwsBase.loader is None:
+                    AwsBase.loader = botocore.loaders.create_loader(core.get_config_variable('data_path'))
+                core.register_component('data_loader', AwsBase.loader)
+
+                if profile:
+                    session = boto3.Session(botocore_session=core, profile_name=profile)
+                elif access_key and secret_key:
+                    session = boto3.Session(botocore_session=core, aws_access_key_id=access_key,
+                                            aws_secret_access_key=secret_key)
+                # If auth isn't provided, set "default" profile (.aws/credentials)
+                else:
+                    session = boto3.Session(botocore_session=core)
+
+                # Each Boto3 session adds its models path to the (shared) loader
+                AwsBase.loader.search_paths[:] = list(OrderedDict.fromkeys(AwsBase.loader.search_paths))
+            return session, Lock()
+
+        return cls.sessions.get((profile, access_key, secret_key), create)
+
+    @classmethod
+    def _create_client(cls, service, region, profile=None, access_key=None, secret_key=None):
+        '''
+        Create a Boto3 client
+
+        Args:
+            service (str): Service to use    (i.e.: ec2, s3, vpc...)
+            region (str): Region name to use (i.e.: eu-central-1)
+            profile (str): Profile name set in ~/.aws/credentials file
+            access_key (str): API access key of your AWS account
+            secret_key (str): API secret key of your AWS account
+
+        Returns:
+            Boto3 client
+        '''
+        session, lock = cls._get_session(profile, access_key, secret_key)
+        with lock:
+            client = session.client(service, region_name=region)
+        cls._register_limiter(client, account=profile or access_key or 'default')
+        return client
+
+    @classmethod
+    def _create_resource(cls, service, region, profile=None, access_key=None, secret_key=None):
+        '''
+        Create a Boto3 resource
+
+        Args:
+            service (str): Service to use    (i.e.: ec2, s3, vpc...)
+            region (str): Region name to use (i.e.: eu-central-1)
+            profile (str): Profile name set in ~/.aws/credentials file
+            access_key (str): API access key of your AWS account
+            secret_key (str): API secret key of your AWS account
+
+        Returns:
+            Boto3 resource (None if the service hasn't resources)
+        '''
+        if service not in cls.service_resources:
+            return None
+
+        session, lock = cls._get_session(profile, access_key, secret_key)
+        with lock:
+            resource = session.resource(service, region_name=region)
+        cls._register_limiter(resource.meta.client, account=profile or access_key or 'default')
+        return resource
+
+    @classmethod
+    def _register_limiter(cls, client, account):
+        '''
+        Limit the calls of a client using the rate limiter of AwsBase (`AwsBase.limiter`)
+
+        Each attempt of a call (retries too) waits for the bucket of its (account, region, API). When a call
+        is throttled, the rate of its bucket is reduced and the call is retried after a random (jittered)
+        exponential delay. The rate only grows after calls which succeed.
+
+        Args:
+            client: Boto3 client
+            account (str): Profile or access key used by the client
+        '''
+        region = client.meta.region_name
+
+        def request_created(operation_name, **kwargs):
+            # Emitted by Botocore before each attempt, so retries take a token too
+            if AwsBase.limiter:
+                AwsBase.limiter.acquire((account, region, operation_name))
+
+        def needs_retry(response, attempts, operation, **kwargs):
+            if not AwsBase.limiter or response is None:
+                return None
+
+            key = (account, region, operation.name)
+            error = response[1].get('Error', {}).get('Code')
+            if error not in cls.throttling_errors:
+                if not error:
+                    AwsBase.limiter.succeeded(key)
+                return None
+
+            AwsBase.limiter.throttled(key)
+            if attempts >= cls.max_attempts:
+                return None
+            return random.uniform(0, min(cls.max_retry_delay, 0.5 * 2 ** attempts))
+
+        # Registered first to wait before the request is signed
+        client.meta.events.register_first('request-created', request_created)
+        # Registered first to replace the default retry handler of Boto3 on throttling errors
+        client.meta.events.register_first('needs-retry', needs_retry)
 
     @classmethod
     def set_auth_config(cls, region, profile=None, access_key=None, secret_key=None):
@@ -141,7 +389,8 @@ class AwsBase(object):
             client_conf (dict): Array with the client configuration (see `get_client_vars`)
 
         Returns:
-            list. Returns same list with the updated elements (region and authentication included)
+            list. Returns same list with the updated elements (region and authentication included),
+                  or a list of Record objects if `records` is enabled
 
         '''
 
@@ -159,6 +408,10 @@ class AwsBase(object):
             _region_dict['RegionName'] = _region_name
         results = []
 
+        if cls.records:
+            context = RecordContext.get(_region_dict, _profile, _access_key)
+            return [Record(element, context) for element in elements]
+
         for element in elements:
 
             if element.get('Authorization') and element.get('RegionName'):
@@ -179,6 +432,145 @@ class AwsBase(object):
 
         return results
 
+    def get_context(self, region=None, profile=None):
+        '''
+        Get an immutable copy of the current client configuration for a region
+
+        Args:
+            region (str): Region name. Current region is used if it's not provided.
+            profile (str): Profile name. Current credentials are used if it's not provided.
+
+        Returns:
+            ClientContext: Service, region and credentials to be used by a task
+        '''
+        _region = str(region or AwsBase.region)
+        if profile:
+            return ClientContext(self.service, _region, str(profile), None, None)
+
+        _profile = str(AwsBase.profile) if AwsBase.profile else None
+        _access_key = str(AwsBase.access_key) if AwsBase.access_key else None
+        _secret_key = str(AwsBase.secret_key) if AwsBase.secret_key else None
+        return ClientContext(self.service, _region, _profile, _access_key, _secret_key)
+
+    def fanout(self, worker, regions=[], profiles=[], return_first=False, stream=False):
+        '''
+        Run a function in parallel for each account and region and join its results
+
+        Each task receives its own ClientContext, so the region of AwsBase is never changed
+        and tasks don't need to lock each other to use their client.
+        All the (profile, region) tasks are scheduled in the same pool. No more than `max_workers`
+        tasks run at the same time and, if `max_workers_per_account` is set, no more than that
+        number of tasks run at the same time for the same account.
+
+        Args:
+            worker (function): Function which receives a ClientContext and returns a list of elements
+                               or yields lists of elements (i.e. one for each page of results)
+            regions (lst): Regions where to run the function
+            profiles (lst): Profiles where to run the function. Current credentials by default.
+            return_first (bool): Return the first element found as soon as it is received.
+                                 Tasks still running are stopped and pending tasks are not launched.
+            stream (bool): Return a generator which yields the elements as soon as they are received
+
+        Raises:
+            Exception: The first exception raised by a task (the rest of the tasks are stopped)
+
+        Examples:
+            worker = lambda ctx: ctx.client.describe_vpcs()['Vpcs']
+            vpcs = aws.service.ec2.fanout(worker, regions=['eu-west-1', 'eu-west-2'])
+
+        Returns:
+            list: Elements returned by all the tasks (or a dict if return_first is True)
+        '''
+        elements = self._ifanout(worker, regions, profiles)
+        if stream:
+            return elements
+
+        if return_first:
+            first = next(elements, None)
+            elements.close()
+            return first if first is not None else dict()
+        return list(elements)
+
+    def _ifanout(self, worker, regions, profiles):
+        regions = self.parse_regions(regions)
+        accounts = OrderedDict()
+        for profile in self.parse_profiles(profiles):
+            contexts = [self.get_context(region['RegionName'], profile) for region in regions]
+            accounts[(contexts[0].profile, contexts[0].access_key)] = deque(contexts)
+
+        max_workers = self.max_workers or self.pool.size
+        max_account_workers = self.max_workers_per_account or max_workers
+        running = dict.fromkeys(accounts, 0)
+        # Bounded queue: Tasks wait while the consumer is processing the pages already received
+        done = Queue(max_workers * 2)
+        stopped = Event()
+        # Messages of tasks run by the consumer thread itself when the queue is full
+        consumer = current_thread()
+        overflow = deque()
+
+        # Threads which wait for a queue run the queued tasks meanwhile, so nested fan-outs
+        # (tasks or consumers that start another fan-out) never wait for a free worker forever.
+        def put(message):
+            while not stopped.is_set():
+                try:
+                    return done.put_nowait(message)
+                except Full:
+                    if current_thread() is consumer:
+                        return overflow.append(message)
+                    if not self.pool.run_pending():
+                        sleep(0.01)
+
+        def get():
+            while True:
+                try:
+                    return done.get_nowait()
+                except Empty:
+                    if overflow:
+                        return overflow.popleft()
+                    if not self.pool.run_pending():
+                        try:
+                            return done.get(timeout=0.05)
+                        except Empty:
+                            pass
+
+        def task(account, context):
+            if stopped.is_set(): return
+            pages = worker(context)
+            for page in ([pages] if isinstance(pages, list) else pages):
+                if stopped.is_set(): break
+                put((account, page, None))
+
+        def finished(account):
+            return lambda future: put((account, None, future))
+
+        pending = sum(len(contexts) for contexts in accounts.values())
+        try:
+            while pending:
+                # Launch tasks (round-robin between accounts) while there are free workers
+                launched = True
+                while launched and sum(running.values()) < max_workers:
+                    launched = False
+                    for account, contexts in accounts.items():
+                        if contexts and running[account] < max_account_workers \
+                            and sum(running.values()) < max_workers:
+                            running[account] += 1
+                            future = self.pool.submit(task, account, contexts.popleft())
+                            future.add_done_callback(finished(account))
+                            launched = True
+
+                # Wait for the next page of results (or the future of a finished task)
+                account, page, future = get()
+                if future is None:
+                    for element in page: yield element
+                else:
+                    running[account] -= 1
+                    pending -= 1
+                    # Raise the exception of the task (if it failed)
+                    future.result()
+        finally:
+            # Consumer has finished, stopped iterating or a task failed: Release the running tasks
+            stopped.set()
+
     def region_in_regions(self, region, regions):
         '''
         Check if region is in a complex list of regions
@@ -238,6 +630,7 @@ class AwsBase(object):
         Returns:
             list. List of strings with available profiles
         '''
+        import boto3
         return boto3.Session().available_profiles
 
     def change_profile(self, profile):
@@ -297,33 +690,66 @@ class AwsBase(object):
         '''
         Get AWS-Standard partition of endpoints.json file (botocore)
 
+        The partition is precompiled once for each version of botocore (see `endpoints_cache`), so next
+        times it is loaded from that file instead of parsing endpoints.json again.
+
         Returns:
             dict: AWS-Standard partition
         '''
         if AwsBase.endpoints == None:
-            # Load endpoints file
-            endpoint_resource = resource_filename('botocore', 'data/endpoints.json')
-            with open(endpoint_resource, 'r') as f:
-                endpoints = json.load(f)
-
-            # Get regions for "AWS Standard" (Not Gov, China)
-            partitions = filter(lambda x: x['partitionName'] == "AWS Standard",
-                                endpoints['partitions'])[0]
-
-            # Format JSON & Save
-            results = dict()
-            results['Regions'] = dict()
-            results['Services'] = partitions['services']
-            results['Defaults'] = partitions['defaults']
-            results['DnsSuffix'] = partitions['dnsSuffix']
-            for k, v in partitions['regions'].iteritems():
-                desc = v['description']
-                results['Regions'][k] = {"Description": desc,
-                                         "Country": desc[desc.find("(")+1:desc.find(")")]}
-            AwsBase.endpoints = results
+            import botocore
+            cache = os.path.expanduser(cls.endpoints_cache.format(botocore=botocore.__version__,
+                                                                  python='%d%d' % sys.version_info[:2]))
+            try:
+                with open(cache, 'rb') as f:
+                    AwsBase.endpoints = marshal.load(f)
+            except (IOError, EOFError, ValueError, TypeError):
+                AwsBase.endpoints = cls._compile_endpoints(os.path.join(os.path.dirname(botocore.__file__),
+                                                                        'data', 'endpoints.json'))
+                try:
+                    if not os.path.exists(os.path.dirname(cache)):
+                        os.makedirs(os.path.dirname(cache))
+                    # Written in a temporary file and renamed, so other processes never read half a file
+                    temp = '%s.%d' % (cache, os.getpid())
+                    with open(temp, 'wb') as f:
+                        marshal.dump(AwsBase.endpoints, f)
+                    os.rename(temp, cache)
+                except (IOError, OSError):
+                    pass
 
         return AwsBase.endpoints
 
+    @classmethod
+    def _compile_endpoints(cls, path):
+        '''
+        Parse the AWS-Standard partition of an endpoints.json file (botocore)
+
+        Args:
+            path (str): Path of the endpoints.json file
+
+        Returns:
+            dict: AWS-Standard partition
+        '''
+        # Load endpoints file
+        with open(path, 'r') as f:
+            endpoints = json.load(f)
+
+        # Get regions for "AWS Standard" (Not Gov, China)
+        partitions = filter(lambda x: x['partitionName'] == "AWS Standard",
+                            endpoints['partitions'])[0]
+
+        # Format JSON & Save
+        results = dict()
+        results['Regions'] = dict()
+        results['Services'] = partitions['services']
+        results['Defaults'] = partitions['defaults']
+        results['DnsSuffix'] = partitions['dnsSuffix']
+        for k, v in partitions['regions'].iteritems():
+            desc = v['description']
+            results['Regions'][k] = {"Description": desc,
+                                     "Country": desc[desc.find("(")+1:desc.find(")")]}
+        return results
+
 
     def get_endpoints(self):
         '''
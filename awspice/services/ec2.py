@@ -52,6 +52,7 @@ class Ec2Service(AwsBase):
 
     from ._ec2.image import _extract_amis
     from ._ec2.image import get_amis
+    from ._ec2.image import iter_amis
     from ._ec2.image import get_ami_by
     from ._ec2.image import get_amis_by
     from ._ec2.image import get_amis_by_distribution
@@ -65,6 +66,8 @@ class Ec2Service(AwsBase):
     
     from ._ec2.instance import _extract_instances
     from ._ec2.instance import get_instances
+    from ._ec2.instance import iter_instances
+    from ._ec2.instance import iter_instances_by
     from ._ec2.instance import get_instance_by
     from ._ec2.instance import get_instances_by
     from ._ec2.instance import start_instances
@@ -73,6 +76,7 @@ class Ec2Service(AwsBase):
 
     from ._ec2.instance import _extract_instance_status
     from ._ec2.instance import get_instances_status
+    from ._ec2.instance import iter_instances_status
     from ._ec2.instance import get_instance_status_by
     from ._ec2.instance import get_instances_status_by
     
@@ -85,6 +89,8 @@ class Ec2Service(AwsBase):
 
     from ._ec2.volume import _extract_volumes
     from ._ec2.volume import get_volumes
+    from ._ec2.volume import iter_volumes
+    from ._ec2.volume import iter_volumes_by
     from ._ec2.volume import get_volume_by
     from ._ec2.volume import get_volumes_by
 
@@ -106,6 +112,8 @@ class Ec2Service(AwsBase):
 
     from ._ec2.security_group import _extract_secgroups
     from ._ec2.security_group import get_secgroups
+    from ._ec2.security_group import iter_secgroups
+    from ._ec2.security_group import iter_secgroups_by
     from ._ec2.security_group import get_secgroup_by
     from ._ec2.security_group import get_secgroups_by
     from ._ec2.security_group import create_security_group
@@ -119,8 +127,22 @@ class Ec2Service(AwsBase):
 
     from ._ec2.address import _extract_addresses
     from ._ec2.address import get_addresses
+    from ._ec2.address import iter_addresses
+    from ._ec2.address import iter_addresses_by
     from ._ec2.address import get_addresses_by
     from ._ec2.address import get_address_by
+
+
+    # #################################
+    # ------- NETWORK INTERFACES ------
+    # #################################
+    from ._ec2.network_interface import network_interface_filters
+
+    from ._ec2.network_interface import _extract_network_interfaces
+    from ._ec2.network_interface import get_network_interfaces
+    from ._ec2.network_interface import iter_network_interfaces
+    from ._ec2.network_interface import get_network_interface_by
+    from ._ec2.network_interface import get_network_interfaces_by
     
 
     # #################################
@@ -128,6 +150,7 @@ class Ec2Service(AwsBase):
     # #################################
     from ._ec2.vpc import _extract_vpcs
     from ._ec2.vpc import get_vpcs
+    from ._ec2.vpc import iter_vpcs
     from ._ec2.vpc import get_default_vpc
 
 
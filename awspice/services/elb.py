@@ -1,20 +1,47 @@
 # -*- coding: utf-8 -*-
 from base import AwsBase
+from awspice.helpers import DnsCache
 from threading import Lock
+from time import time
 import dns.resolver
 
 
 class ElbService(AwsBase):
     '''
     Class belonging to the Load Balancers service.
+
+    Attributes:
+        dns: Cache of the DNS answers used to find load balancers by domain (records are kept for their TTL)
+        index_ttl: Seconds after which the index of the load balancers of a region is rebuilt
     '''
 
+    dns = DnsCache()
+
+    # INDEX: Load balancers of each (region, profile, access key) by DNSName and LoadBalancerName
+    index_ttl = 300
+    _indexes = dict()
+    _indexes_lock = Lock()
+
     loadbalancer_filters = {
         'domain': '',
         'tagname': '',
         'cname': '',
     }
 
+    def _get_region_from_cname(self, cname):
+        '''
+        Get the region of a load balancer from its DNS name
+
+        The position of the region depends on the type of load balancer (classic and ALB:
+        name.region.elb.amazonaws.com, NLB: name.elb.region.amazonaws.com, with an optional
+        "dualstack." prefix), so it is the first label which is a known region.
+
+        Return:
+            str: Region name or None if the DNS name doesn't include a region
+        '''
+        regions = self.get_regions()
+        return next((str(label) for label in cname.lower().rstrip('.').split('.') if label in regions), None)
+
     @classmethod
     def _get_cname_from_domain(cls, domain):
         '''
@@ -28,7 +55,7 @@ class ElbService(AwsBase):
             str: String with DNS Canonical Name.
         '''
         try:
-            cname = str(dns.resolver.query(domain, "CNAME")[0]).rstrip('.')
+            cname = cls.dns.resolve(domain, "CNAME")[0]
             if 'aws.com' not in cname: raise ValueError('Domain %s is not in AWS' % domain)
             return cname
         except (dns.resolver.NXDOMAIN):
@@ -37,33 +64,158 @@ class ElbService(AwsBase):
             raise dns.resolver.NoAnswer("Couldn't find any records (NoAnswer)")
 
 
-    def get_loadbalancers(self, regions=[]):
+    def get_loadbalancers(self, regions=[], profiles=[]):
         '''
         Get all Elastic Load Balancers for a region
 
+        Only classic load balancers are listed. Application and Network Load Balancers are listed
+        by `get_loadbalancers_v2`.
+
         Args:
             regions (list): Regions where to look for this element
+            profiles (list): Profiles (accounts) where to look for this element
 
         Returns:
             LoadBalancers (list): List of dictionaries with the load balancers requested
         '''
-        results = list()
-        regions = self.parse_regions(regions=regions)
-        lock = Lock()
-        
-        def worker(region):
-            lock.acquire()
-            self.change_region(region['RegionName'])
-            config = self.get_client_vars()
-            lock.release()
-            elbs = self.client.describe_load_balancers()['LoadBalancerDescriptions']
-            results.extend(self.inject_client_vars(elbs, config))
+        return self._extract_loadbalancers(regions=regions, profiles=profiles)
 
-        
-        [self.pool.add_task(worker, region) for region in regions]
-        self.pool.wait_completion()
+    def iter_loadbalancers(self, regions=[], profiles=[]):
+        '''
+        Iterate over all Elastic Load Balancers as they are received (page by page)
 
-        return results
+        Only classic load balancers are listed (see `iter_loadbalancers_v2`).
+
+        Args:
+            regions (list): Regions where to look for this element
+            profiles (list): Profiles (accounts) where to look for this element
+
+        Yields:
+            LoadBalancer (dict): Dictionary with each load balancer
+        '''
+        return self._extract_loadbalancers(regions=regions, profiles=profiles, stream=True)
+
+    def _extract_loadbalancers(self, regions=[], profiles=[], stream=False):
+
+        def worker(context):
+            for page in context.paginate('describe_load_balancers'):
+                yield self.inject_client_vars(page['LoadBalancerDescriptions'], context.client_vars)
+
+        return self.fanout(worker, regions=regions, profiles=profiles, stream=stream)
+
+    def _get_indexes(self, regions=[], profiles=[]):
+        '''
+        Get the indexes (by DNSName and by LoadBalancerName) of the load balancers of each account and region
+
+        The indexes are built from the load balancers listed (page by page), classic and ELBv2 ones,
+        and they are reused until they are older than `index_ttl` seconds.
+
+        Args:
+            regions (list): Regions of the indexes
+            profiles (list): Profiles (accounts) of the indexes
+
+        Returns:
+            list: Dicts with 'DNSName' and 'LoadBalancerName' indexes of each account and region
+        '''
+        contexts = [self.get_context(region['RegionName'], profile)
+                    for profile in self.parse_profiles(profiles) for region in self.parse_regions(regions)]
+        now = time()
+        with self._indexes_lock:
+            expired = [c for c in contexts if c[1:4] not in self._indexes or self._indexes[c[1:4]][0] <= now]
+
+        if expired:
+            def worker(context):
+                index = {'DNSName': dict(), 'LoadBalancerName': dict()}
+                pages = [page['LoadBalancerDescriptions'] for page in context.paginate('describe_load_balancers')] + \
+                        [page['LoadBalancers'] for page in context._replace(service='elbv2').paginate('describe_load_balancers')]
+                for page in pages:
+                    for elb in self.inject_client_vars(page, context.client_vars):
+                        index['DNSName'][elb['DNSName'].lower()] = elb
+                        index['LoadBalancerName'][elb['LoadBalancerName']] = elb
+                return [(context[1:4], index)]
+
+            built = self.fanout(worker, regions=list(set(c.region for c in expired)),
+                                profiles=list(set(c.profile for c in expired)))
+            with self._indexes_lock:
+                for key, index in built:
+                    self._indexes[key] = (now + self.index_ttl, index)
+
+        with self._indexes_lock:
+            return [self._indexes[c[1:4]][1] for c in contexts]
+
+    @classmethod
+    def clear_indexes(cls):
+        '''
+        Remove the indexes of load balancers, so they are rebuilt in the next search
+        '''
+        with cls._indexes_lock:
+            cls._indexes.clear()
+
+    def _extract_loadbalancers_v2(self, regions=[], profiles=[], target_health=False, stream=False):
+
+        def get_target_health(client, target_group):
+            return client.describe_target_health(TargetGroupArn=target_group['TargetGroupArn'])['TargetHealthDescriptions']
+
+        def worker(context):
+            # Application & Network load balancers are in the elbv2 API
+            context = context._replace(service='elbv2')
+            target_groups = dict()
+            if target_health:
+                groups = [group for page in context.paginate('describe_target_groups') for group in page['TargetGroups']]
+                healths = self.pool.map(lambda group: get_target_health(context.client, group), groups)
+                for group, health in zip(groups, healths):
+                    group['TargetHealthDescriptions'] = health
+                    for arn in group.get('LoadBalancerArns', []):
+                        target_groups.setdefault(arn, []).append(group)
+
+            for page in context.paginate('describe_load_balancers'):
+                elbs = page['LoadBalancers']
+                # Tags of 20 load balancers (maximum allowed) in each call
+                arns = [elb['LoadBalancerArn'] for elb in elbs]
+                tags = dict()
+                for i in range(0, len(arns), 20):
+                    for description in context.client.describe_tags(ResourceArns=arns[i:i + 20])['TagDescriptions']:
+                        tags[description['ResourceArn']] = description.get('Tags', [])
+
+                for elb in elbs:
+                    elb['Tags'] = tags.get(elb['LoadBalancerArn'], [])
+                    if target_health:
+                        elb['TargetGroups'] = target_groups.get(elb['LoadBalancerArn'], [])
+                yield self.inject_client_vars(elbs, context.client_vars)
+
+        return self.fanout(worker, regions=regions, profiles=profiles, stream=stream)
+
+    def get_loadbalancers_v2(self, regions=[], profiles=[], target_health=False):
+        '''
+        Get all Application and Network Load Balancers (ELBv2) for a region
+
+        Tags are included in each load balancer (`Tags`). With target_health, the target groups of each load
+        balancer are included too (`TargetGroups`), with the health of their targets (`TargetHealthDescriptions`).
+
+        Args:
+            regions (list): Regions where to look for this element
+            profiles (list): Profiles (accounts) where to look for this element
+            target_health (bool): Include the target groups and the health of their targets
+
+        Returns:
+            LoadBalancers (list): List of dictionaries with the load balancers requested
+        '''
+        return self._extract_loadbalancers_v2(regions=regions, profiles=profiles, target_health=target_health)
+
+    def iter_loadbalancers_v2(self, regions=[], profiles=[], target_health=False):
+        '''
+        Iterate over all Application and Network Load Balancers (ELBv2) as they are received (page by page)
+
+        Args:
+            regions (list): Regions where to look for this element
+            profiles (list): Profiles (accounts) where to look for this element
+            target_health (bool): Include the target groups and the health of their targets
+
+        Yields:
+            LoadBalancer (dict): Dictionary with each load balancer
+        '''
+        return self._extract_loadbalancers_v2(regions=regions, profiles=profiles, target_health=target_health,
+                                              stream=True)
 
     def get_loadbalancers_by(self, filter_key, filter_value, regions=[]):
         '''Get loadbalancers which match with the filters
@@ -86,14 +238,47 @@ class ElbService(AwsBase):
         return results
 
 
-    def get_loadbalancer_by(self, filter_key, filter_value, regions=[]):
+    def get_loadbalancers_by_domains(self, domains, profiles=[]):
+        '''
+        Get the load balancers of several domains at once
+
+        The CNAMEs of all the domains are resolved at the same time (see `dns`), and the load balancers
+        are listed only once for each region found in the CNAMEs.
+
+        Args:
+            domains (list): Domains which point (CNAME) to load balancers
+            profiles (list): Profiles (accounts) where to look for the load balancers
+
+        Examples:
+            elbs = aws.service.elb.get_loadbalancers_by_domains(['www.example.com', 'api.example.com'])
+
+        Returns:
+            dict: Load balancer of each domain (None if the domain doesn't point to a load balancer)
+        '''
+        cnames = dict()
+        for domain, records in self.dns.resolve_all(domains, 'CNAME', pool=self.pool).items():
+            cname = next(iter(records), '').lower()
+            cnames[domain] = cname if 'aws.com' in cname else None
+
+        regions = list(set(self._get_region_from_cname(cname) for cname in cnames.values() if cname) - set([None]))
+        elbs = dict()
+        if regions:
+            for index in self._get_indexes(regions=regions, profiles=profiles):
+                elbs.update(index['DNSName'])
+
+        return dict((domain, elbs.get(cname)) for domain, cname in cnames.items())
+
+    def get_loadbalancer_by(self, filter_key, filter_value, regions=[], profiles=[]):
         '''
         Get a load balancer for a region that matches with filter
 
+        The load balancers of all the accounts and regions are listed at the same time (see `fanout`).
+
         Args:
             filter_key (str): Name of the filter
             filter_value (str): Value of the filter
             regions (list): Regions where to look for this element
+            profiles (list): Profiles (accounts) where to look for this element
 
         Raises:
             dns.resolver.NXDOMAIN: DNS Name not registered.
@@ -106,13 +291,19 @@ class ElbService(AwsBase):
             raise ValueError('Invalid filter key. Allowed filters: ' + str(self.loadbalancer_filters.keys()))
 
         if filter_key == 'tagname':
-            elbs = self.get_loadbalancer_by(filter_key, filter_value, regions)
+            index_key, value = 'LoadBalancerName', filter_value
         else:
             cname = self._get_cname_from_domain(filter_value) if filter_key == 'domain' else filter_value
-            self.change_region(cname.split('.')[1])
-            elbs = [elb for elb in self.get_loadbalancers() if elb['DNSName'].lower() == cname.lower()]
+            region = self._get_region_from_cname(cname)
+            if not region:
+                return None
+            regions = [region]
+            index_key, value = 'DNSName', cname.lower()
 
-        return next(iter(elbs or []), None)
+        for index in self._get_indexes(regions=regions, profiles=profiles):
+            if value in index[index_key]:
+                return index[index_key][value]
+        return None
 
 
     def __init__(self):
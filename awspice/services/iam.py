@@ -7,27 +7,31 @@ class IamService(AwsBase):
     Class belonging to the IAM Identity & Access management service.
     '''
 
-    def get_inactive_users(self):
+    def get_inactive_users(self, profiles=[]):
         ''' Get users who have not logged in AWS since 1 year.
         This method returns users who haven't used their password and one of their keys in less than 9 months.
-        
+
+        Accounts are analyzed in parallel and, inside each account, users are analyzed in parallel too.
+
+        Args:
+            profiles (list): Profiles (accounts) where to look for users
+
         Returns:
             list: List of inactive users
         '''
 
-        results = []
         today = datetime.now()
         min_inactive_days = 270 # 9 months
 
-        def worker(user):
+        def check_user(client, user):
             pass_last_use = user.get('PasswordLastUsed', None)
             pass_inactive_days = (today - pass_last_use.replace(tzinfo=None)).days if pass_last_use else None
 
             if not pass_last_use or pass_inactive_days > min_inactive_days:
 
                 inactive_keys = []
-                for key in self.client.list_access_keys(UserName=user['UserName'])['AccessKeyMetadata']:
-                    key_info = self.client.get_access_key_last_used(AccessKeyId=key['AccessKeyId'])['AccessKeyLastUsed']
+                for key in client.list_access_keys(UserName=user['UserName'])['AccessKeyMetadata']:
+                    key_info = client.get_access_key_last_used(AccessKeyId=key['AccessKeyId'])['AccessKeyLastUsed']
                     
                     key_last_use = key_info.get('LastUsedDate', None)
                     key_inactive_days = (today - key_last_use.replace(tzinfo=None)).days if key_last_use else None
@@ -40,42 +44,56 @@ class IamService(AwsBase):
                     inactive_pass = {'Inactive': not bool(pass_last_use), 'LastUsed': pass_last_use}
                     inactive_user = { 'LoginActivity' : { 'Password' : inactive_pass, 'AccessKeys' : inactive_keys } }
                     user.update(inactive_user)
-                    results.append(user)
+                    return user
+
+        def worker(context):
+            users = [user for page in context.paginate('list_users') for user in page['Users']]
+            # Nested fan-out: Users of this account are checked by other tasks of the pool
+            users = self.pool.map(lambda user: check_user(context.client, user), users)
+            return self.inject_client_vars([user for user in users if user], context.client_vars)
+
+        return self.fanout(worker, profiles=profiles)
+
+    def _extract_users(self, profiles=[], stream=False):
 
+        def worker(context):
+            for page in context.paginate('list_users'):
+                yield self.inject_client_vars(page['Users'], context.client_vars)
 
-        for user in self.get_users(): self.pool.add_task(worker, user)
-        self.pool.wait_completion()
-        
-        return results
+        return self.fanout(worker, profiles=profiles, stream=stream)
 
-    def get_users(self):
+    def get_users(self, profiles=[]):
         '''
         List all users for an AWS account
 
+        Args:
+            profiles (list): Profiles (accounts) where to look for users
+
         Returns:
             List of all users
         '''
-        results = []
-        config = self.get_client_vars()
+        return self._extract_users(profiles=profiles)
 
-        paginator = self.client.get_paginator('list_users').paginate()
-        for response in paginator:
-            for user in response['Users']: results.append(user)
+    def iter_users(self, profiles=[]):
+        '''
+        Iterate over all users for an AWS account as they are received (page by page)
 
-        return self.inject_client_vars(results, config)
+        Args:
+            profiles (list): Profiles (accounts) where to look for users
+
+        Yields:
+            Each user
+        '''
+        return self._extract_users(profiles=profiles, stream=True)
 
     def get_access_keys(self, user):
-        results = []
         access_keys = self.client.list_access_keys(UserName=user)['AccessKeyMetadata']
 
         def worker(ak):
             ak['LastUse'] = self.get_access_key_last_used(ak['AccessKeyId'])['AccessKeyLastUsed']
-            results.append(ak)
-
-        [self.pool.add_task(worker, ak) for ak in access_keys]
-        self.pool.wait_completion()
+            return ak
 
-        return self.inject_client_vars(results)
+        return self.inject_client_vars(list(self.pool.map(worker, access_keys)))
 
     def get_access_key_last_used(self, accesskey):
         last_use = self.client.get_access_key_last_used(AccessKeyId=accesskey)
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from base import AwsBase
-from threading import Lock
 
 class RdsService(AwsBase):
     '''
@@ -12,31 +11,21 @@ class RdsService(AwsBase):
         'cluster': 'db-cluster-id',
     }
 
-    def _extract_databases(self, filters=[], regions=[], return_first=False):
-        results = dict() if return_first else list()
-        regions = self.parse_regions(regions=regions)
-        lock = Lock()
-        
-        def worker(region):
-            lock.acquire()
-            self.change_region(region['RegionName'])
-            config = self.get_client_vars()
-            lock.release()
-            
-            rdss = self.client.describe_db_instances(Filters=filters)['DBInstances']
-
-            if rdss:
-                rds = self.inject_client_vars(rdss, config)
-                if return_first:
-                    results.update(rdss[0])
-                else:
-                    results.extend(rdss)
-
-        for region in regions:
-            self.pool.add_task(worker, region)
-        self.pool.wait_completion()
-
-        return results
+    def _extract_databases(self, filters=[], regions=[], return_first=False, profiles=[], stream=False):
+
+        def worker(context):
+            for page in context.paginate('describe_db_instances', Filters=filters):
+                yield self.inject_client_vars(page['DBInstances'], context.client_vars)
+
+        return self.fanout(worker, regions=regions, profiles=profiles, return_first=return_first, stream=stream)
+
+    def _extract_snapshots(self, regions=[], profiles=[], stream=False):
+
+        def worker(context):
+            for page in context.paginate('describe_db_snapshots'):
+                yield self.inject_client_vars(page['DBSnapshots'], context.client_vars)
+
+        return self.fanout(worker, regions=regions, profiles=profiles, stream=stream)
 
 
     def get_database_by(self, filters, regions=[]):
@@ -45,45 +34,57 @@ class RdsService(AwsBase):
 
 
 
-    def get_databases(self, regions=[]):
+    def get_databases(self, regions=[], profiles=[]):
         '''
         Get RDS instances in regions
 
         Args:
             regions (list): Regions where you want to look for
+            profiles (list): Profiles (accounts) where you want to look for
 
         Returns:
             (list): List of RDS dicts
         '''
-        return self._extract_databases(regions=regions)
+        return self._extract_databases(regions=regions, profiles=profiles)
+
+    def iter_databases(self, regions=[], profiles=[]):
+        '''
+        Iterate over RDS instances in regions as they are received (page by page)
+
+        Args:
+            regions (list): Regions where you want to look for
+            profiles (list): Profiles (accounts) where you want to look for
 
-    def get_snapshots(self, regions=[]):
+        Yields:
+            (dict): Each RDS dict
+        '''
+        return self._extract_databases(regions=regions, profiles=profiles, stream=True)
+
+    def get_snapshots(self, regions=[], profiles=[]):
         '''
         Get RDS snapshots in regions
 
         Args:
             regions (list): Regions where you want to look for
+            profiles (list): Profiles (accounts) where you want to look for
 
         Returns:
             (list): List of RDS dicts
         '''
-        results = list()
-        regions = self.parse_regions(regions=regions)
-        lock = Lock()
-        
-        def worker(region):
-            lock.acquire()
-            self.change_region(region['RegionName'])
-            config = self.get_client_vars()
-            lock.release()
-            rdss = self.client.describe_db_snapshots()['DBSnapshots']
-            results.extend(self.inject_client_vars(rdss, config))
-
-        for region in regions:
-            self.pool.add_task(worker, region)
-        self.pool.wait_completion()
-
-        return results
+        return self._extract_snapshots(regions=regions, profiles=profiles)
+
+    def iter_snapshots(self, regions=[], profiles=[]):
+        '''
+        Iterate over RDS snapshots in regions as they are received (page by page)
+
+        Args:
+            regions (list): Regions where you want to look for
+            profiles (list): Profiles (accounts) where you want to look for
+
+        Yields:
+            (dict): Each RDS snapshot dict
+        '''
+        return self._extract_snapshots(regions=regions, profiles=profiles, stream=True)
 
 
     def __init__(self):
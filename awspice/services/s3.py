@@ -24,16 +24,21 @@ class S3Service(AwsBase):
         self.resource.Bucket(bucket_name).put_object(Key=filepath, Body=data)
 
 
-    def get_buckets(self):
+    def get_buckets(self, profiles=[]):
         '''
         Get all buckets in S3
 
+        Args:
+            profiles (list): Profiles (accounts) where to look for buckets
+
         Returns:
             Buckets (list): List of dictionaries with the buckets requested
         '''
-        config = self.get_client_vars()
-        buckets = self.client.list_buckets()['Buckets']
-        return self.inject_client_vars(buckets, config)
+        def worker(context):
+            buckets = context.client.list_buckets()['Buckets']
+            return self.inject_client_vars(buckets, context.client_vars)
+
+        return self.fanout(worker, profiles=profiles)
 
 
     def get_bucket_acl(self, bucketname):
@@ -51,8 +56,6 @@ class S3Service(AwsBase):
         Returns:
             Buckets-ACL (list): List of dictionaries with the buckets requested
         '''
-        results = []
-
         # https://docs.aws.amazon.com/AmazonS3/latest/dev/acl-overview.html
         global_acl = 'http://acs.amazonaws.com/groups/global/AllUsers'
 
@@ -69,15 +72,13 @@ class S3Service(AwsBase):
                         bucket_result['Permissions'] = []
                         bucket_result['Permissions'].append(grant['Permission'])
                 
-                if bucket_result: results.append(bucket_result)
+                return bucket_result
 
             # AccessDenied getting GetBucketAcl
             except ClientError: pass
 
         config = self.get_client_vars()
-
-        for bucket in self.get_buckets(): self.pool.add_task(worker, bucket=bucket)
-        self.pool.wait_completion()
+        results = [bucket for bucket in self.pool.map(worker, self.get_buckets()) if bucket]
 
         return self.inject_client_vars(results, config)
 
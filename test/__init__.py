@@ -1,4 +1,83 @@
+from collections import namedtuple
+from awspice.helpers import Executor
+from awspice.services.base import AwsBase
+
+
+# Offline fakes of the services, shared by the unit tests of the modules.
+# Defined before the test cases are imported, which import them from this package.
+
+class FakeContext(namedtuple('FakeContext', ['service', 'region', 'profile', 'access_key', 'source'])):
+    '''
+    Client context which lists the pages of its FakeService (`pages`) instead of calling AWS
+    '''
+
+    @property
+    def client_vars(self):
+        return {'region': {'RegionName': self.region}, 'profile': self.profile, 'access_key': self.access_key}
+
+    def paginate(self, operation):
+        self.source.calls.append(operation)
+        return self.source.pages.get((self.service, operation), [self.source.default_page])
+
+
+class FakeService(object):
+    '''
+    Service which runs fan-outs sequentially on FakeContexts
+
+    Attributes:
+        pages: Pages of each (service, operation)
+        default_page: Page of the operations which aren't in `pages`
+        calls: Operations paginated
+        profile: Current profile (None for the default credentials)
+        access_key: Current access key
+    '''
+    inject_client_vars = AwsBase.inject_client_vars
+    pool = Executor(10)
+    region = 'eu-west-1'
+    all_regions = ['eu-west-1', 'us-east-1']
+
+    def __init__(self, pages={}, default_page={}, profile=None, access_key=None):
+        self.pages = pages
+        self.default_page = default_page
+        self.calls = list()
+        self.profile = profile
+        self.access_key = access_key
+
+    def parse_profiles(self, profiles=[]):
+        return [profiles] if isinstance(profiles, str) else profiles or [self.profile]
+
+    def parse_regions(self, regions=[], default_all=False):
+        if isinstance(regions, str):
+            regions = [regions]
+        if regions and isinstance(regions[0], dict):
+            return regions
+        return [{'RegionName': region} for region in regions or (self.all_regions if default_all else [self.region])]
+
+    def get_context(self, region=None, profile=None):
+        if profile:
+            return FakeContext('ec2', region or self.region, profile, None, self)
+        return FakeContext('ec2', region or self.region, self.profile, self.access_key, self)
+
+    def fanout(self, worker, regions=[], profiles=[], return_first=False, stream=False):
+        # Workers return a list of elements or yield lists of elements (as in AwsBase.fanout)
+        elements = (element for region in self.parse_regions(regions) for profile in self.parse_profiles(profiles)
+                    for pages in [worker(self.get_context(region['RegionName'], profile))]
+                    for page in ([pages] if isinstance(pages, list) else pages) for element in page)
+        return elements if stream else list(elements)
+
+
+class FakeAws:
+
+    def __init__(self, service=None):
+        self.ec2 = self.elb = self.rds = self.acm = self.iam = self.s3 = service or FakeService()
+
+
 from service_ec2 import ServiceEc2TestCase
 from service_base import ServiceBaseTestCase
+from helpers import HelpersTestCase
 
 from module_finder import ModuleFinderTestCase
+from module_inventory import ModuleInventoryTestCase
+from module_export import ModuleExportTestCase
+from module_stats import ModuleStatsTestCase
+from module_security import ModuleSecurityTestCase
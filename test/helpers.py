@@ -0,0 +1,175 @@
+import unittest
+import time
+import datetime
+import tempfile
+from awspice.helpers import Executor, LRUCache, RateLimiter, IpRanges, DnsCache
+import dns.resolver
+from awspice.cache import InventoryCache
+from awspice.records import Record, RecordContext
+import pickle
+
+class HelpersTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        print("\nStarting unit tests of Helpers")
+
+    #################################
+    # ----------- CACHES ---------- #
+    #################################
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 0)
+        cache.get('c', lambda: 3)
+        self.assertEquals(cache.get('a', lambda: 0), 1)
+        self.assertEquals(cache.get('b', lambda: 0), 0)
+
+    def test_inventory_cache(self):
+        cache = InventoryCache(tempfile.mktemp(suffix='.sqlite'))
+        page = {'Reservations': [], 'Date': datetime.datetime(2018, 1, 1)}
+        filters = {'Filters': [{'Name': 'a', 'Values': ['2', '1']}, {'Name': 'b', 'Values': ['3']}]}
+        cache.set('default', 'eu-west-1', 'ec2.describe_instances', filters, [cache.serialize(page)])
+
+        filters = {'Filters': [{'Name': 'b', 'Values': ['3']}, {'Name': 'a', 'Values': ['1', '2']}]}
+        self.assertEquals(cache.get('default', 'eu-west-1', 'ec2.describe_instances', filters), [page])
+        self.assertEquals(cache.get('default', 'eu-west-2', 'ec2.describe_instances', filters), None)
+
+        cache.invalidate(operation='describe_instances')
+        self.assertEquals(cache.get('default', 'eu-west-1', 'ec2.describe_instances', filters), None)
+
+    def test_inventory_cache_expiration(self):
+        cache = InventoryCache(tempfile.mktemp(suffix='.sqlite'), ttls={'describe_vpcs': 0}, max_size=50)
+        cache.set('default', 'eu-west-1', 'ec2.describe_vpcs', {}, [cache.serialize({'Vpcs': []})])
+        self.assertEquals(cache.get('default', 'eu-west-1', 'ec2.describe_vpcs', {}), None)
+
+        cache.set('default', 'eu-west-1', 'ec2.describe_volumes', {}, [cache.serialize({'Volumes': [1] * 10})])
+        cache.set('default', 'eu-west-1', 'ec2.describe_images', {}, [cache.serialize({'Images': [2] * 10})])
+        self.assertEquals(cache.get('default', 'eu-west-1', 'ec2.describe_volumes', {}), None)
+        self.assertEquals(cache.get('default', 'eu-west-1', 'ec2.describe_images', {}), [{'Images': [2] * 10}])
+
+    #################################
+    # ---------- RECORDS ---------- #
+    #################################
+
+    def test_records(self):
+        context = RecordContext.get({'RegionName': 'eu-west-1'}, profile='qa')
+        self.assertTrue(context is RecordContext.get({'RegionName': 'eu-west-1'}, profile='qa'))
+
+        record = Record({'InstanceId': 'i-1', 'Tags': [{'Key': 'Name', 'Value': 'web'}]}, context)
+        self.assertEquals(record['InstanceId'], 'i-1')
+        self.assertEquals(record.TagName, 'web')
+        self.assertEquals(record.get('Region'), {'RegionName': 'eu-west-1'})
+        self.assertEquals(record.get('Missing', 1), 1)
+        self.assertTrue(record.data is record.data)
+
+        loaded = pickle.loads(pickle.dumps(record, 2))
+        self.assertEquals(loaded.to_dict(), record.to_dict())
+        self.assertTrue(loaded.context is context)
+
+    #################################
+    # ---------- EXECUTOR --------- #
+    #################################
+
+    def test_executor_nested_tasks(self):
+        pool = Executor(2)
+        results = pool.map(lambda x: sum(pool.map(lambda y: x * y, range(10))), range(10))
+        self.assertEquals(list(results), [x * 45 for x in range(10)])
+
+    def test_executor_errors(self):
+        pool = Executor(2)
+        future = pool.submit(lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, future.result)
+        self.assertTrue('elapsed' in future.timing)
+
+    #################################
+    # -------- RATE LIMITS -------- #
+    #################################
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(rate=20)
+        start = time.time()
+        for _ in range(30): limiter.acquire('key')
+        self.assertTrue(time.time() - start >= 0.45)
+
+    def test_rate_limiter_throttled(self):
+        limiter = RateLimiter(rate=20, min_rate=1)
+        limiter.throttled('key')
+        self.assertEquals(limiter.get_rate('key'), 10)
+        limiter.succeeded('key')
+        self.assertTrue(limiter.get_rate('key') > 10)
+
+    def test_rate_limiter_recovers(self):
+        limiter = RateLimiter(rate=20, min_rate=1, increase=0.5)
+        limiter.throttled('key')
+        limiter.throttled('key')
+        self.assertEquals(limiter.get_rate('key'), 5)
+        # The initial rate is recovered after less than 4 seconds of successful calls (5 + 7.5 + 11.25 + ...)
+        calls = 0
+        while limiter.get_rate('key') < 20:
+            limiter.succeeded('key')
+            calls += 1
+        self.assertTrue(calls < 5 + 8 + 12 + 17)
+
+    #################################
+    # --------- IP RANGES --------- #
+    #################################
+
+    def test_ip_ranges(self):
+        ranges = IpRanges(ranges={
+            'prefixes': [{'ip_prefix': '52.94.0.0/16', 'region': 'eu-west-1', 'service': 'AMAZON'},
+                         {'ip_prefix': '52.94.0.0/16', 'region': 'eu-west-1', 'service': 'EC2'},
+                         {'ip_prefix': '52.94.5.0/24', 'region': 'eu-west-1', 'service': 'AMAZON'},
+                         {'ip_prefix': '3.0.0.0/8', 'region': 'GLOBAL', 'service': 'CLOUDFRONT'}],
+            'ipv6_prefixes': [{'ipv6_prefix': '2a05:d018::/35', 'region': 'eu-west-1', 'service': 'EC2'}]})
+        self.assertEquals(ranges.lookup('52.94.5.7'), {'region': 'eu-west-1', 'service': 'ec2'})
+        self.assertEquals(ranges.lookup('3.3.3.3'), {'region': None, 'service': 'cloudfront'})
+        self.assertEquals(ranges.lookup('2a05:d018::1'), {'region': 'eu-west-1', 'service': 'ec2'})
+        self.assertEquals(ranges.lookup_all(['8.8.8.8', 'invalid']), {'8.8.8.8': {}, 'invalid': {}})
+
+    #################################
+    # ------------ DNS ------------ #
+    #################################
+
+    def test_dns_cache(self):
+        queries = list()
+
+        class Answer(list):
+            expiration = time.time() + 60
+
+        def query(domain, rdtype):
+            queries.append(domain)
+            if domain == 'missing.example.com':
+                raise dns.resolver.NXDOMAIN()
+            return Answer(['elb-1.eu-west-1.elb.amazonaws.com.'])
+
+        original, dns.resolver.query = dns.resolver.query, query
+        try:
+            cache = DnsCache()
+            results = cache.resolve_all(['www.example.com', 'missing.example.com'] * 5, 'CNAME')
+            self.assertEquals(results['www.example.com'], ['elb-1.eu-west-1.elb.amazonaws.com'])
+            self.assertEquals(results['missing.example.com'], [])
+            self.assertRaises(dns.resolver.NXDOMAIN, cache.resolve, 'missing.example.com', 'CNAME')
+            self.assertEquals(sorted(queries), ['missing.example.com', 'www.example.com'])
+        finally:
+            dns.resolver.query = original
+
+    def test_dns_cache_evict(self):
+        now = time.time()
+        cache = DnsCache(maxsize=10)
+        cache.items = dict((('live-%d' % i, 'A'), (now + 60 + i, [])) for i in range(8))
+        cache.items.update((('expired-%d' % i, 'A'), (now - 1, [])) for i in range(2))
+        cache._evict()
+        # Only the expired answers are removed, there is room for a new one
+        self.assertEquals(sorted(cache.items), [('live-%d' % i, 'A') for i in range(8)])
+
+        cache.items.update((('live-%d' % i, 'A'), (now + 60 + i, [])) for i in range(8, 10))
+        cache._evict()
+        # The answer which expires first is removed to make room for a new one
+        self.assertEquals(sorted(cache.items), sorted(('live-%d' % i, 'A') for i in range(1, 10)))
+
+
+if __name__ == '__main__':
+        unittest.main()
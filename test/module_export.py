@@ -0,0 +1,66 @@
+import unittest
+import datetime
+from awspice.modules import ExportModule
+
+INSTANCES = [
+    {'InstanceId': 'i-1', 'InstanceType': 't2.micro', 'State': {'Name': 'running'},
+     'LaunchTime': datetime.datetime(2020, 1, 1), 'Tags': [{'Key': 'Name', 'Value': 'web'}], 'TagName': 'web',
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+    {'InstanceId': 'i-2', 'InstanceType': 't2.micro', 'State': {'Name': 'stopped'},
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+]
+VOLUMES = [
+    {'VolumeId': 'vol-1', 'Size': 8, 'Encrypted': True, 'CreateTime': datetime.datetime(2040, 1, 1),
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+    {'VolumeId': 'vol-2', 'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ModuleExportTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        print("\nStarting unit tests of Module.Export")
+
+    def setUp(self):
+        self.export = ExportModule(None)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_export_numpy(self):
+        instances = self.export.to_numpy('instances', iter(INSTANCES))
+        self.assertEquals(list(instances['InstanceType']), ['t2.micro', 't2.micro'])
+        self.assertEquals(list(instances['Tags']), ['{"Name": "web"}', '{}'])
+        self.assertEquals(str(instances['LaunchTime'][0]), '2020-01-01T00:00:00')
+        self.assertTrue(numpy.isnat(instances['LaunchTime'][1]))
+
+    @unittest.skipIf(pyarrow is None, 'PyArrow is not installed')
+    def test_export_arrow(self):
+        instances = self.export.to_arrow('instances', iter(INSTANCES))
+        self.assertEquals(instances.num_rows, 2)
+        self.assertEquals(str(instances.schema.field('State').type.value_type), 'string')
+        self.assertEquals(instances.column('LaunchTime').null_count, 1)
+
+    @unittest.skipIf(pyarrow is None, 'PyArrow is not installed')
+    def test_export_arrow_volumes(self):
+        volumes = self.export.to_arrow('volumes', iter(VOLUMES))
+        self.assertEquals(volumes.column('VolumeSize').to_pylist(), [8, 0])
+        self.assertEquals(volumes.column('Encrypted').to_pylist(), [True, False])
+        # Timestamps after 2038 don't fit in 32-bit integers
+        self.assertEquals(volumes.column('CreateTime').cast(pyarrow.int64()).to_pylist(), [2208988800, None])
+
+    def test_export_invalid_kind(self):
+        self.assertRaises(ValueError, self.export._build_columns, 'buckets', INSTANCES)
+
+
+if __name__ == '__main__':
+        unittest.main()
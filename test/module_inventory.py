@@ -0,0 +1,71 @@
+import unittest
+from awspice.modules import InventoryModule
+from test import FakeAws, FakeService
+
+INSTANCE = {'InstanceId': 'i-1', 'PrivateIpAddress': '10.0.0.1', 'PublicIpAddress': '52.0.0.1',
+            'PublicDnsName': 'EC2-52-0-0-1.compute.amazonaws.com', 'TagName': 'web',
+            'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'},
+            'NetworkInterfaces': [{'PrivateIpAddresses': [{'PrivateIpAddress': '10.0.0.2'}]}]}
+INTERFACES = [
+    {'NetworkInterfaceId': 'eni-1', 'PrivateIpAddress': '10.0.0.1', 'Attachment': {'InstanceId': 'i-1'},
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+    {'NetworkInterfaceId': 'eni-2', 'PrivateIpAddress': '10.0.0.3', 'Description': 'ELB app/my-alb/50dc6c495c0c9188',
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+    {'NetworkInterfaceId': 'eni-3', 'PrivateIpAddress': '10.0.0.4', 'InterfaceType': 'nat_gateway',
+     'Description': 'Interface for NAT Gateway nat-0123', 'Association': {'PublicIp': '52.0.0.9'},
+     'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}},
+]
+
+class FakeInventory(InventoryModule):
+
+    def _load_elements(self, kind):
+        return {'instances': [INSTANCE], 'network_interfaces': INTERFACES}.get(kind, [])
+
+
+class ModuleInventoryTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        print("\nStarting unit tests of Module.Inventory")
+
+    def setUp(self):
+        self.inventory = FakeInventory(FakeAws(FakeService(profile='qa'))).load('qa', 'eu-west-1')
+
+    def test_inventory_get_by(self):
+        self.assertEquals(self.inventory.get_by('instances', {'privateip': '10.0.0.2'}), INSTANCE)
+        self.assertEquals(self.inventory.get_by('instances', {'dnsname': 'ec2-52-0-0-1.compute.amazonaws.com'}), INSTANCE)
+        self.assertEquals(self.inventory.get_by('instances', {'publicip': '52.0.0.1', 'tagname': 'web'}), INSTANCE)
+        self.assertEquals(self.inventory.get_by('instances', {'publicip': '52.0.0.1', 'tagname': 'db'}), None)
+
+    def test_inventory_invalid_filter(self):
+        self.assertFalse(self.inventory.can_search('volumes', {'privateip': '10.0.0.1'}))
+        self.assertRaises(ValueError, self.inventory.get_all_by, 'volumes', {'privateip': '10.0.0.1'})
+
+    def test_inventory_can_search(self):
+        self.assertTrue(self.inventory.can_search('instances', {'privateip': '10.0.0.1'}, 'qa', 'eu-west-1'))
+        # Profiles or regions which haven't been loaded are searched in AWS
+        self.assertFalse(self.inventory.can_search('instances', {'privateip': '10.0.0.1'}, ['qa', 'prod'], 'eu-west-1'))
+        self.assertFalse(self.inventory.can_search('instances', {'privateip': '10.0.0.1'}, 'qa', 'us-east-1'))
+        self.assertFalse(self.inventory.can_search('instances', {'privateip': '10.0.0.1'}, 'qa'))
+
+    def test_inventory_default_credentials(self):
+        # Elements found with the default credentials or access keys are stored with 'default' or the access key
+        for aws, account in [(FakeAws(), 'default'), (FakeAws(FakeService(access_key='AKIA1')), 'AKIA1')]:
+            instance = dict(INSTANCE, Authorization={'Type': 'Profile', 'Value': account})
+            inventory = FakeInventory(aws)
+            inventory._load_elements = lambda kind: [instance] if kind == 'instances' else []
+            inventory.load(regions='eu-west-1')
+            self.assertTrue(inventory.can_search('instances', {'id': 'i-1'}, regions='eu-west-1'))
+            self.assertEquals(inventory.get_by('instances', {'id': 'i-1'}, [None], 'eu-west-1'), instance)
+            self.assertFalse(inventory.can_search('instances', {'id': 'i-1'}, 'qa', 'eu-west-1'))
+
+    def test_inventory_owner_by_ip(self):
+        self.assertEquals(self.inventory.get_owner_by_ip('10.0.0.1')['Resource'], INSTANCE)
+        self.assertEquals(self.inventory.get_owner_by_ip('10.0.0.3')['ResourceId'], 'my-alb')
+        owners = self.inventory.get_owners_by_ips(['52.0.0.9', '10.9.9.9'])
+        self.assertEquals(owners['52.0.0.9']['ResourceType'], 'nat_gateway')
+        self.assertEquals(owners['10.9.9.9'], None)
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from awspice.modules import SecurityModule
+from awspice.modules.security import ExposureIndex, SecgroupGraph
+from test import FakeAws, FakeService
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SECGROUPS = [
+    {'GroupId': 'sg-web', 'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443,
+                                              'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]},
+    {'GroupId': 'sg-ssh', 'IpPermissions': [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '10.0.0.0/8'}]}]},
+]
+INSTANCES = [{'InstanceId': 'i-%d' % n, 'SecurityGroups': [{'GroupId': 'sg-web'}, {'GroupId': 'sg-ssh'}]}
+             for n in range(500)]
+PAGES = {
+    ('ec2', 'describe_security_groups'): [{'SecurityGroups': SECGROUPS[:1]}, {'SecurityGroups': SECGROUPS[1:]}],
+    ('ec2', 'describe_instances'): [{'Reservations': [{'Instances': INSTANCES[:250]}]},
+                                    {'Reservations': [{'Instances': INSTANCES[250:]}]}],
+}
+
+
+class ModuleSecurityTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        print("\nStarting unit tests of Module.Security")
+
+    def setUp(self):
+        self.service = FakeService(PAGES)
+        self.security = SecurityModule(FakeAws(self.service))
+
+    def test_region_portlisting(self):
+        listing = self.security.get_region_portlisting('eu-west-1')
+        self.assertEquals(listing['RegionName'], 'eu-west-1')
+        self.assertEquals(len(listing['Instances']), 500)
+        rules = listing['Instances'][0]['SecurityGroups'][1]['Rules']
+        self.assertEquals(rules, [{'ToPort': '', 'FromPort': '', 'Protocol': 'ALL', 'IpRange': ['10.0.0.0/8']}])
+        self.assertEquals(self.service.calls.count('describe_security_groups'), 1)
+        self.assertFalse('Rules' in INSTANCES[0]['SecurityGroups'][0])
+
+    def test_regions_portlisting(self):
+        listing = self.security.get_regions_portlisting(['eu-west-1', 'eu-west-2'], profiles=['qa', 'prod'])
+        self.assertEquals(sorted(len(region['Instances']) for region in listing), [1000, 1000])
+        self.assertEquals(self.service.calls.count('describe_security_groups'), 4)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_exposure_index(self):
+        context = {'Region': {'RegionName': 'eu-west-1'}, 'Authorization': {'Type': 'Profile', 'Value': 'qa'}}
+        secgroups = [dict(secgroup, **context) for secgroup in SECGROUPS] + [dict(context, GroupId='sg-v6',
+            IpPermissions=[{'IpProtocol': 'udp', 'FromPort': 53, 'ToPort': 53, 'Ipv6Ranges': [{'CidrIpv6': '::/0'}]}])]
+        web = dict(context, InstanceId='i-web', SecurityGroups=[{'GroupId': 'sg-web'}])
+        internal = dict(context, InstanceId='i-internal', SecurityGroups=[{'GroupId': 'sg-ssh'}])
+        index = ExposureIndex(secgroups, [web, internal])
+
+        self.assertEquals(index.get_exposed_instances(443, 'tcp', '0.0.0.0/0'), [web])
+        self.assertEquals(index.get_exposed_instances(22, 'tcp', '0.0.0.0/0'), [])
+        self.assertEquals(index.get_exposed_instances(22, '6', '10.1.2.0/24'), [internal])
+        self.assertEquals(index.get_exposed_instances(22, 'tcp', '10.0.0.0/7'), [])
+        self.assertEquals(index.get_exposed_instances(22, 'tcp', '10.0.0.0/7', match='any'), [internal])
+        self.assertEquals([sg['GroupId'] for sg in index.get_exposed_secgroups(53, 'udp', '2001:db8::1')], ['sg-v6'])
+        exposed = index.get_exposed_all([(443, 'tcp', '10.0.0.1'), (80, 'tcp', '8.8.8.8')])
+        self.assertEquals(len(exposed[(443, 'tcp', '10.0.0.1')]), 2)
+        self.assertEquals(exposed[(80, 'tcp', '8.8.8.8')], [])
+
+    def test_secgroup_graph(self):
+        def secgroup(group, sources, port):
+            return {'GroupId': group, 'IpPermissions': [{'IpProtocol': 'tcp', 'FromPort': port, 'ToPort': port,
+                                                         'UserIdGroupPairs': [{'GroupId': s} for s in sources]}]}
+        secgroups = [secgroup('sg-web', [], 443), secgroup('sg-app', ['sg-web'], 8080),
+                     secgroup('sg-admin', [], 22), secgroup('sg-db', ['sg-admin'], 5432)]
+        interfaces = [
+            {'NetworkInterfaceId': 'eni-1', 'Groups': [{'GroupId': 'sg-web'}], 'Attachment': {'InstanceId': 'i-web'}},
+            # The application servers are in the admin group too
+            {'NetworkInterfaceId': 'eni-2', 'Groups': [{'GroupId': 'sg-app'}, {'GroupId': 'sg-admin'}],
+             'Attachment': {'InstanceId': 'i-app'}},
+            {'NetworkInterfaceId': 'eni-3', 'Groups': [{'GroupId': 'sg-db'}], 'RequesterId': 'amazon-rds'},
+        ]
+        graph = SecgroupGraph(secgroups, interfaces)
+
+        self.assertEquals(graph.can_reach('sg-web', 'sg-db', port=5432),
+                          [('sg-web', 'sg-app'), ('sg-admin', 'sg-db')])
+        self.assertEquals(graph.can_reach('sg-web', 'sg-db', port=5432, transitive=False), None)
+        self.assertEquals(graph.can_reach('sg-web', 'sg-db', port=22), None)
+        self.assertEquals(graph.get_reachable('sg-web'), set(['sg-app', 'sg-db']))
+        self.assertEquals(graph.get_reachable('sg-db'), set())
+        self.assertTrue(graph.get_closure('sg-web') is graph.get_closure('sg-web'))
+        self.assertEquals(graph.get_members('sg-db')[0]['ResourceType'], 'database')
+
+
+if __name__ == '__main__':
+        unittest.main()
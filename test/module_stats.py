@@ -1,5 +1,46 @@
 import unittest
+import time
 import awspice
+from awspice.modules import StatsModule
+from test import FakeAws, FakeService
+
+PAGES = {
+    ('ec2', 'describe_volumes'): [{'Volumes': [{'State': 'available', 'VolumeType': 'gp2', 'Size': 8}]},
+                                  {'Volumes': [{'State': 'in-use', 'VolumeType': 'gp2', 'Size': 100},
+                                               {'State': 'in-use', 'VolumeType': 'io1', 'Size': 50}]}],
+    ('elbv2', 'describe_load_balancers'): [{'LoadBalancers': [{'Type': 'application'}]}],
+    ('iam', 'list_users'): [{'Users': [{'UserName': 'admin'}]}],
+}
+
+# Listings without pages have no elements
+EMPTY_PAGE = dict.fromkeys(['Reservations', 'Users', 'Buckets', 'SecurityGroups', 'Volumes', 'Addresses', 'Vpcs',
+                            'LoadBalancerDescriptions', 'LoadBalancers', 'DBInstances', 'CertificateSummaryList'], [])
+
+
+class StatsService(FakeService):
+
+    def get_volumes_by(self, filters, regions=[], profiles=[]):
+        region = {'RegionName': regions[0]}
+        return [{'VolumeType': 'io1', 'Size': 100, 'Iops': 1000, 'Region': region}] if filters['status'] == 'available' else []
+
+    def iter_addresses_by(self, filters, regions=[], profiles=[]):
+        region = {'RegionName': regions[0]}
+        return iter([{'AssociationId': 'eipassoc-1', 'Region': region}, {'Domain': filters['domain'], 'Region': region}])
+
+    def iter_loadbalancers(self, regions=[], profiles=[]):
+        region = {'RegionName': regions[0]}
+        return iter([{'Instances': [], 'Region': region}, {'Instances': [{'InstanceId': 'i-1'}], 'Region': region}])
+
+    def iter_loadbalancers_v2(self, regions=[], profiles=[], target_health=False):
+        region = {'RegionName': regions[0]}
+        return iter([{'Type': 'network', 'TargetGroups': [{'TargetHealthDescriptions': []}], 'Region': region}])
+
+    def __getattr__(self, name):
+        def listing(regions=[], profiles=[]):
+            time.sleep(0.1)
+            return [name] + regions
+        return listing
+
 
 class ModuleStatsTestCase(unittest.TestCase):
 
@@ -7,6 +48,9 @@ class ModuleStatsTestCase(unittest.TestCase):
     def setUpClass(cls):
         print("\nStarting unit tests of Module.Stats")
 
+    def setUp(self):
+        self.stats = StatsModule(FakeAws(StatsService(PAGES, EMPTY_PAGE)))
+
     def test_get_stats_of_region(self):
         aws = awspice.connect('eu-west-1', 'qa')
         stats = aws.stats.get_stats(regions=['eu-west-1'])
@@ -35,5 +79,46 @@ class ModuleStatsTestCase(unittest.TestCase):
         self.assertTrue(isinstance(costs['Regions']['eu-west-1']['LoadBalancers'],list))
 
 
+    def test_stats_parallel(self):
+        started = time.time()
+        stats = self.stats.get_stats(regions=['eu-west-1', 'eu-west-2'])
+        # 18 listings of 0.1 seconds in a pool of 10 threads
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEquals(stats['Users'], ['get_users'])
+        self.assertEquals(stats['Regions']['eu-west-2']['Instances'], ['get_instances', 'eu-west-2'])
+        self.assertEquals(len(stats['Regions']['eu-west-1']), 8)
+        self.assertEquals(stats['Regions']['eu-west-1']['LoadBalancers'],
+                          ['get_loadbalancers', 'eu-west-1', 'get_loadbalancers_v2', 'eu-west-1'])
+
+    def test_stats_max_workers(self):
+        self.stats.max_workers = 2
+        started = time.time()
+        self.stats.get_stats(regions=['eu-west-1'])
+        self.assertGreaterEqual(time.time() - started, 0.5)
+
+    def test_stats_summary(self):
+        summary = self.stats.get_summary(regions=['eu-west-1', 'eu-west-2'], profiles=['qa', 'prod'])
+        self.assertEquals(sorted(summary['Accounts']), ['prod', 'qa'])
+        self.assertEquals(summary['Accounts']['qa']['Users'], {'Count': 1})
+        region = summary['Accounts']['prod']['Regions']['eu-west-2']
+        self.assertEquals(region['Volumes']['SizeByType'], {'gp2': 108, 'io1': 50})
+        self.assertEquals(region['Volumes']['ByState'], {'available': 1, 'in-use': 2})
+        self.assertEquals(region['LoadBalancers'], {'Count': 1, 'ByType': {'application': 1}})
+        self.assertEquals(region['Instances'], {'Count': 0, 'ByState': {}, 'ByType': {}})
+
+    def test_stats_cost_saving(self):
+        savings = self.stats.cost_saving(regions=['eu-west-1', 'eu-west-2'])
+        region = savings['Regions']['eu-west-2']
+        self.assertEquals(len(region['Volumes']), 1)
+        self.assertEquals(region['Addresses'], [{'Domain': 'vpc', 'Region': {'RegionName': 'eu-west-2'}}])
+        self.assertEquals(len(region['LoadBalancers']), 2)
+        # 100 GiB io1 (12.5) + 1000 IOPS (65) + Elastic IP (3.65) + Classic ELB (18.25) + NLB (16.43)
+        self.assertAlmostEquals(savings['MonthlyCost']['eu-west-1'], 115.83)
+
+        findings = sorted(self.stats.iter_cost_saving(regions=['eu-west-1']), key=lambda x: -x['MonthlyCost'])
+        self.assertEquals([finding['ResourceType'] for finding in findings],
+                          ['Volumes', 'LoadBalancers', 'LoadBalancers', 'Addresses'])
+
+
 if __name__ == '__main__':
         unittest.main()
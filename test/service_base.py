@@ -1,7 +1,10 @@
 import unittest
 import re
 from os.path import expanduser
+import botocore.session
 import awspice
+from awspice.services.base import AwsBase
+from awspice.helpers import RateLimiter
 
 class ServiceBaseTestCase(unittest.TestCase):
 
@@ -135,6 +138,52 @@ class ServiceBaseTestCase(unittest.TestCase):
         self.assertIn({'RegionName':regionsList[0]}, resultsList)
         self.assertIn({'RegionName':regionsList[1]}, resultsList)
 
+    ####################################
+    # ~~~~~~~~~~  RATE LIMITS ~~~~~~~~ #
+    ####################################
+
+    def test_rate_limiter_attempts(self):
+        calls = list()
+
+        class Limiter(RateLimiter):
+            def acquire(self, key): calls.append('acquire')
+            def succeeded(self, key): calls.append('succeeded')
+            def throttled(self, key): calls.append('throttled')
+
+        class Response:
+            def __init__(self, status_code, content):
+                self.status_code, self.content, self.headers = status_code, content, {}
+
+        class HttpSession:
+            def __init__(self, responses):
+                self.responses = responses
+            def send(self, request, **kwargs):
+                return self.responses.pop(0)
+
+        def error(code):
+            return Response(400, '<Response><Errors><Error><Code>%s</Code><Message></Message></Error></Errors>'
+                                 '<RequestID>1</RequestID></Response>' % code)
+
+        client = botocore.session.get_session().create_client('ec2', region_name='eu-west-1',
+                                                                aws_access_key_id='AKIA1', aws_secret_access_key='secret')
+        AwsBase._register_limiter(client, account='AKIA1')
+        original = AwsBase.limiter, AwsBase.max_retry_delay
+        AwsBase.limiter, AwsBase.max_retry_delay = Limiter(), 0
+        try:
+            # Throttled, then succeeds: Each attempt takes a token
+            client._endpoint.http_session = HttpSession([error('RequestLimitExceeded'),
+                                                         Response(200, '<DescribeVpcsResponse><vpcSet/></DescribeVpcsResponse>')])
+            client.describe_vpcs()
+            self.assertEquals(calls, ['acquire', 'throttled', 'acquire', 'succeeded'])
+
+            # Other errors don't increase the rate
+            del calls[:]
+            client._endpoint.http_session = HttpSession([error('UnauthorizedOperation')])
+            self.assertRaises(botocore.exceptions.ClientError, client.describe_vpcs)
+            self.assertEquals(calls, ['acquire'])
+        finally:
+            AwsBase.limiter, AwsBase.max_retry_delay = original
+
 
 
 if __name__ == '__main__':
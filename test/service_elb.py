@@ -22,6 +22,34 @@ class ServiceElbTestCase(unittest.TestCase):
         elb = aws.service.elb.get_loadbalancer_by('domain', 'aws.elevenpaths.com')
         self.assertEquals(elb['CanonicalHostedZoneName'], 'elevenpaths-web-pro-1763591843.eu-west-1.elb.amazonaws.com')
 
+    def test_get_region_from_cname(self):
+        elb = awspice.services.ElbService()
+        self.assertEquals(elb._get_region_from_cname('my-elb-1234.eu-west-1.elb.amazonaws.com'), 'eu-west-1')
+        self.assertEquals(elb._get_region_from_cname('my-nlb-1234567890abcdef.elb.eu-west-1.amazonaws.com'), 'eu-west-1')
+        self.assertEquals(elb._get_region_from_cname('dualstack.my-alb-1234.us-east-2.elb.amazonaws.com.'), 'us-east-2')
+        self.assertEquals(elb._get_region_from_cname('www.example.com'), None)
+
+    def test_get_loadbalancers_by_domains_nlb(self):
+        elb = awspice.services.ElbService()
+        nlb = {'DNSName': 'my-nlb-1234567890abcdef.elb.eu-west-1.amazonaws.com'}
+        requested = list()
+
+        def get_indexes(regions=[], profiles=[]):
+            requested.extend(regions)
+            return [{'DNSName': {nlb['DNSName']: nlb}, 'LoadBalancerName': {}}]
+
+        elb._get_indexes = get_indexes
+        elb.dns.resolve_all = lambda domains, rdtype, pool=None: {
+            'nlb.example.com': [nlb['DNSName']],
+            'alb.example.com': ['dualstack.my-alb-1234.us-east-2.elb.amazonaws.com']}
+        try:
+            elbs = elb.get_loadbalancers_by_domains(['nlb.example.com', 'alb.example.com'])
+        finally:
+            del elb.dns.resolve_all
+        self.assertEquals(sorted(requested), ['eu-west-1', 'us-east-2'])
+        self.assertEquals(elbs['nlb.example.com'], nlb)
+        self.assertEquals(elbs['alb.example.com'], None)
+
 
 if __name__ == '__main__':
         unittest.main()